@@ -0,0 +1,133 @@
+"""Benchmark the clock render pipeline without any hardware or terminal output
+
+Drives run_clock.Board, with in-memory mock lights, through a simulated
+day for every face and mode combination and reports how long each stage
+of a tick takes.
+"""
+import copy
+import datetime
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import blessed
+import click
+
+import faces
+import mocklights
+import modes
+import timesayer
+from run_clock import Board
+
+
+STAGES = ['update_board', 'get_board_text', 'do_lights', 'convert_to_text']
+
+
+def get_mode_combinations() -> list[list[str]]:
+    """Return the combinations of modes to benchmark"""
+    combinations = [[name] for name in modes.get_valid_modes()]
+    for name in modes.get_valid_modes():
+        if modes.modes[name].type == modes.FaceModeType.EDGE:
+            combinations.append(['Normal', name])
+    return combinations
+
+
+def make_board(term: blessed.Terminal, face: str, mode_names: list[str]) -> Board:
+    """Return a board set up like run_clock would, showing "It is" if the face has those words"""
+    board = Board(term, datetime.datetime(2024, 1, 1),
+                  simple=face == '14x5',
+                  lights=lambda n: mocklights.FastMockLights(term, n), light_color=(255, 255, 255),
+                  display=[modes.modes[name](None) for name in mode_names],
+                  month_mode=face == 'date')
+    board.add_words(copy.deepcopy(faces.faces[face]))
+    try:
+        board.get_activation_plan('It is')
+        board.show_it_is = True
+    except ValueError:
+        pass
+    return board
+
+
+def run_tick(board: Board, measure: Callable[[str, Callable[[], Any]], Any]) -> None:
+    """Run one tick of the pipeline, measuring each stage"""
+    measure('update_board', board.update_board)
+    text = measure('get_board_text', lambda: board.get_board_text(terminal_mode=False))
+    measure('do_lights', lambda: board.do_lights(text, board.lights))
+    measure('convert_to_text', lambda: timesayer.convert_to_text(board.time, show_a=board.show_a))
+
+
+def benchmark(board: Board, minutes: int, allocations: bool) -> dict[str, dict[str, float]]:
+    """Run the board through the minutes and return the statistics for each stage"""
+    timings: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    peaks: dict[str, list[int]] = {stage: [] for stage in STAGES}
+
+    def time_stage(stage: str, fn: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        result = fn()
+        timings[stage].append(time.perf_counter() - start)
+        return result
+
+    def trace_stage(stage: str, fn: Callable[[], Any]) -> Any:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        peaks[stage].append(tracemalloc.get_traced_memory()[1] - current)
+        return result
+
+    start_time = board.time
+    for minute in range(minutes):
+        board.time = start_time + datetime.timedelta(minutes=minute)
+        run_tick(board, time_stage)
+    #
+    if allocations:
+        tracemalloc.start()
+        try:
+            for minute in range(minutes):
+                board.time = start_time + datetime.timedelta(minutes=minute)
+                run_tick(board, trace_stage)
+        finally:
+            tracemalloc.stop()
+    #
+    results = {}
+    for stage in STAGES:
+        percentiles = statistics.quantiles(timings[stage], n=100, method='inclusive')
+        results[stage] = {
+            'p50': percentiles[49] * 1e6,
+            'p90': percentiles[89] * 1e6,
+            'p99': percentiles[98] * 1e6,
+            'max': max(timings[stage]) * 1e6,
+            'alloc': statistics.mean(peaks[stage]) if peaks[stage] else 0.0,
+        }
+    return results
+
+
+@click.command()
+@click.option('--face', 'face_names', type=click.Choice(faces.get_valid_faces()), multiple=True,
+              help='Face to benchmark, can have multiple (default all)')
+@click.option('--mode', 'mode_names', type=click.Choice(modes.get_valid_modes()), multiple=True,
+              help='Modes to use together, can have multiple (default all combinations)')
+@click.option('--minutes', type=click.IntRange(min=2), default=24 * 60,
+              help='Number of minutes to simulate, at least two to work out percentiles')
+@click.option('--allocations/--no-allocations', default=True, help='Whether to measure memory allocated per stage')
+def main(face_names: list[str], mode_names: list[str], minutes: int, allocations: bool) -> None:
+    term = blessed.Terminal()
+    combinations = [list(mode_names)] if mode_names else get_mode_combinations()
+    print(f'{"face":<10} {"modes":<30} {"stage":<16} {"p50 us":>9} {"p90 us":>9} '
+          f'{"p99 us":>9} {"max us":>9} {"peak B":>9}')
+    for face in face_names or faces.get_valid_faces():
+        for combination in combinations:
+            label = '+'.join(combination)
+            try:
+                results = benchmark(make_board(term, face, combination), minutes, allocations)
+            except Exception as err:
+                print(f'{face:<10} {label:<30} failed: {err!r}')
+                continue
+            for stage, result in results.items():
+                print(f'{face:<10} {label:<30} {stage:<16} {result["p50"]:>9.1f} {result["p90"]:>9.1f} '
+                      f'{result["p99"]:>9.1f} {result["max"]:>9.1f} {result["alloc"]:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,21 @@
 """Class to handle updating the clock face and edges"""
 
 from __future__ import annotations
+import asyncio
 import sys
 import enum
-import os
 import datetime
+import pathlib
 import time
 from datetime import timedelta
 from typing import TYPE_CHECKING, Callable, Any
 
 import blessed
 
+import file_watcher
 import modes
 import setdate
+import startup_timeline
 import wificonfig
 
 if TYPE_CHECKING:
@@ -25,12 +28,43 @@ class UpdateModes(enum.Enum):
     CONFIG_WIFI = 'config WIFI'     # Action button triggers to start scanning for QR code
     CONFIG_QR = 'config QR'         # Clock is trying to get QR code
 
+
+CONFIG_FILE = 'config/config.sh'
+
+# Longest to wait between updates (s). The waits are on the monotonic clock, so
+# this bounds how long a jump in the wall clock (eg NTP setting it after boot)
+# takes to show
+MAX_UPDATE_DELAY = 60.0
+
+# Settings that can be changed without restarting the clock
+LIVE_SETTINGS = {'face_mode', 'mode', 'mode_parameters', 'light_color', 'interval', 'show_it_is', 'show_a'}
+
+
+class UpdaterEvent(enum.Enum):
+    MODE_BUTTON = 'mode button'         # Mode button (or key) pressed
+    ACTION_BUTTON = 'action button'     # Action button (or key) pressed
+    QUIT = 'quit'                       # Any other key pressed
+    NEW_DATA = 'new data'               # A mode has new data to show
+    CONFIG_CHANGED = 'config changed'   # The config file changed
+    WIFI_DONE = 'wifi done'             # WIFI configuration finished, value is the stage reached
+    CONFIG_LOOK = 'config look'         # Change the config mode's edges, value is (color, edges, cycle)
+
 class Updater:
-    """A class to manage updating the clock"""
+    """A class to manage updating the clock
+
+    The clock runs as a set of asyncio tasks: one reading keys, one watching
+    for file changes and one configuring the WIFI when asked. These only
+    post events to a queue, the render task is the only one that changes
+    the board, so the display keeps going while slow things happen
+    elsewhere. The button callbacks from gpiozero come in on other threads
+    so they also just post events.
+    """
 
     def __init__(self, board: Board, current_offset: timedelta, term: blessed.Terminal, interval: float,
                  simulation_offset: timedelta, lights: Callable[[int], Any]|None,
-                 button_key: str, mode_button_key: str, set_system_time: bool, qrcode_file: str):
+                 button_key: str, mode_button_key: str, set_system_time: bool, qrcode_file: str,
+                 settings: dict[str, Any]|None=None, read_settings: Callable[[], dict[str, Any]]|None=None,
+                 timeline: startup_timeline.Timeline|None=None):
         self.mode = UpdateModes.NORMAL
         self.wifi_config = wificonfig.WifiConfigurator(self, qrcode_file)
         self.board = board
@@ -48,6 +82,13 @@ class Updater:
         self.last_key_press = time.time()
         self.mode_cancel_timer: int = 0
         self.edge_modes = [mode(None) for mode in modes.modes.values() if mode.include_as_dynamic]
+        self.loop: asyncio.AbstractEventLoop|None = None
+        self.events: asyncio.Queue[tuple[UpdaterEvent, Any]]|None = None     # Made when running
+        self.wifi_task: asyncio.Task[None]|None = None
+        self.watcher = file_watcher.watcher
+        self.settings = settings
+        self.read_settings = read_settings
+        self.timeline = timeline
 
     def update_board(self) -> list[str]:
         """Update the display of the clock"""
@@ -55,48 +96,205 @@ class Updater:
         self.board.show_board(logs)
         return logs
 
-    def update(self) -> None:
-        last_config_time = os.path.getmtime('config/config.sh')
+    def get_update_delay(self) -> float|None:
+        """Return how long until the board next needs updating, or None if only an event will change it"""
+        if self.mode != UpdateModes.NORMAL or self.simulation_offset:
+            # Counting down the config mode or moving time along
+            return self.interval
+        delays = [delay for mode in self.board.modes
+                  if (delay := mode.get_update_delay(self.board, self.interval)) is not None]
+        return min(delays + [MAX_UPDATE_DELAY]) if delays else None
+
+    def post_event(self, event: UpdaterEvent, value: Any=None) -> None:
+        """Send an event to the render task, this can be called from any thread"""
+        if self.loop and self.events:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, (event, value))
+
+    def reload_config(self) -> bool:
+        """Apply any changed settings from the config, returning False if the clock has to restart for them"""
+        if self.settings is None or self.read_settings is None:
+            return False
+        try:
+            settings = self.read_settings()
+        except Exception as err:
+            self.board.renderer.log(f'Could not read the config: {err}')
+            return False
+        changed = {name for name, value in settings.items() if value != self.settings.get(name)}
+        if changed - LIVE_SETTINGS:
+            return False
+        #
+        if 'interval' in changed:
+            self.interval = settings['interval']
+        if 'mode' in changed or 'mode_parameters' in changed:
+            self.old_modes = [modes.modes[name](settings['mode_parameters']) for name in settings['mode']]
+            if self.mode == UpdateModes.NORMAL:
+                self.board.modes = self.old_modes
+        self.board.apply_settings(settings, changed)
+        self.settings = settings
+        return True
+
+    def show_config(self, color: tuple[int, int, int]|None=None, edges: tuple[bool, bool, bool, bool]|None=None,
+                    cycle: bool=False) -> None:
+        """Ask the render task to change how the config mode looks and draw the board again"""
+        self.post_event(UpdaterEvent.CONFIG_LOOK, (color, edges, cycle))
+
+    def set_config_look(self, color: tuple[int, int, int]|None, edges: tuple[bool, bool, bool, bool]|None,
+                        cycle: bool) -> None:
+        """Change how the config mode looks"""
+        if color:
+            self.config_mode.color = color
+        if edges:
+            self.config_mode.set_edges(*edges)
+        if cycle:
+            self.config_mode.cycle_edges()
+
+    async def read_keys(self) -> None:
+        """Turn key presses into events"""
+        with self.term.cbreak():
+            while True:
+                pressed = await asyncio.to_thread(self.term.inkey, timeout=self.interval)
+                if pressed == self.button_key:
+                    self.post_event(UpdaterEvent.MODE_BUTTON)
+                elif pressed == self.mode_button_key:
+                    self.post_event(UpdaterEvent.ACTION_BUTTON)
+                elif pressed:
+                    self.post_event(UpdaterEvent.QUIT)
+
+    async def watch_files(self) -> None:
+        """Watch for changes to the config and the data the modes show"""
+        def config_changed(path: pathlib.Path) -> None:
+            self.post_event(UpdaterEvent.CONFIG_CHANGED)
+
+        def new_data(path: pathlib.Path) -> None:
+            self.post_event(UpdaterEvent.NEW_DATA)
+
+        data_files = {filename for mode in self.edge_modes + self.board.modes + self.config_modes
+                      for filename in mode.get_watched_files()}
+        self.watcher.subscribe(CONFIG_FILE, config_changed)
+        for filename in data_files:
+            self.watcher.subscribe(filename, new_data)
+        try:
+            await self.watcher.run()
+        finally:
+            self.watcher.unsubscribe(CONFIG_FILE, config_changed)
+            for filename in data_files:
+                self.watcher.unsubscribe(filename, new_data)
+
+    async def configure_wifi(self) -> None:
+        """Configure the WIFI and tell the render task how it went, even if it failed"""
+        ip_address = None
+        try:
+            result = await self.wifi_config.start_reading()
+            if result == wificonfig.WifiConfigStage.NETWORK_JOINED:
+                ip_address = await asyncio.to_thread(modes.get_ip_address)
+        except Exception as err:
+            # Nothing waits on this task, so the error would be lost and the clock stuck reading QR codes
+            self.board.renderer.log(f'Configuring the WIFI failed: {err!r}')
+            result = self.wifi_config.wifi_stage = wificonfig.WifiConfigStage.FAILED
+        self.post_event(UpdaterEvent.WIFI_DONE, (result, ip_address))
+
+    def finish_wifi(self, result: wificonfig.WifiConfigStage, ip_address: str|None=None) -> None:
+        """Show the result of configuring the WIFI"""
+        self.wifi_task = None
+        self.mode = UpdateModes.NORMAL
+        if result == wificonfig.WifiConfigStage.NETWORK_JOINED:
+            show_ip_address = modes.ShowIPAddress(None)
+            show_ip_address.ip_address = ip_address
+            self.board.modes = [show_ip_address]
+        else:
+            self.mode_cancel_timer = 10
+
+    def tick(self, countdown: bool=True) -> None:
+        """Move the clock on and show it, counting down the config mode if this is a timed tick"""
+        start = time.perf_counter()
+        t = datetime.datetime.now()
+        self.board.time = (t + self.current_offset)
+        #
+        # Set the lights to show we are now in active config
+        if self.mode == UpdateModes.CONFIG_QR:
+            if self.wifi_task is None:
+                self.wifi_task = asyncio.create_task(self.configure_wifi())
+        elif self.mode != UpdateModes.NORMAL:
+            self.config_mode.set_edges_from_int(self.mode_cancel_timer)
+            if countdown:
+                self.mode_cancel_timer -= 1
+                if self.mode_cancel_timer < 0:
+                    self.reset_config()
+        #
+        self.update_board()
+        #
+        self.current_offset += self.simulation_offset
+        if self.timeline:
+            self.timeline.add_tick(time.perf_counter() - start)
+
+    async def render(self) -> int:
+        """Own the board, updating it when needed or when an event comes in, returning the exit code
+
+        Events redraw the board straight away but don't put off the next
+        timed tick, which is the only one to count down the config modes.
+        """
+        assert self.events is not None
+        loop = asyncio.get_running_loop()
+        deadline: float|None = loop.time()
         while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                event, value = await asyncio.wait_for(self.events.get(), timeout)
+            except asyncio.TimeoutError:
+                event, value = None, None
+            if event == UpdaterEvent.QUIT:
+                return 0
+            elif event == UpdaterEvent.CONFIG_CHANGED and not self.reload_config():
+                return 2
+            elif event == UpdaterEvent.MODE_BUTTON:
+                self.mode_button_press()
+            elif event == UpdaterEvent.ACTION_BUTTON:
+                self.action_button_press()
+            elif event == UpdaterEvent.WIFI_DONE:
+                self.finish_wifi(*value)
+            elif event == UpdaterEvent.CONFIG_LOOK:
+                self.set_config_look(*value)
+            self.tick(countdown=event is None)
+            delay = self.get_update_delay()
+            next_deadline = None if delay is None else loop.time() + delay
+            if event is None or deadline is None or (next_deadline is not None and next_deadline < deadline):
+                deadline = next_deadline
+
+    async def run(self) -> int:
+        """Run all the tasks until the clock stops, returning the exit code"""
+        self.events = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        tasks = [asyncio.create_task(self.read_keys()), asyncio.create_task(self.watch_files())]
+        try:
+            return await self.render()
+        finally:
+            self.loop = None
+            self.events = None
+            for task in tasks:
+                task.cancel()
+            if self.wifi_task:
+                self.wifi_task.cancel()
+
+    def update(self) -> None:
+        exit_code = 0
+        try:
+            exit_code = asyncio.run(self.run())
+        except KeyboardInterrupt:
+            print('CTRL-C detected')
+        finally:
+            # Clean up however the clock stopped, including when restarting for a config change
+            if self.timeline:
+                self.timeline.save()
             try:
-                t = datetime.datetime.now()
-                self.board.time = (t + self.current_offset)
-                #
-                with self.term.cbreak():
-                    if pressed := self.term.inkey(timeout=self.interval):
-                        if pressed == self.button_key:
-                            self.mode_button_press()
-                        elif pressed == self.mode_button_key:
-                            self.action_button_press()
-                        else:
-                            break
-                #
-                # Set the lights to show we are now in active config
-                if self.mode == UpdateModes.CONFIG_QR:
-                    result = self.wifi_config.start_reading()
-                    self.mode = UpdateModes.NORMAL
-                    if result == wificonfig.WifiConfigStage.NETWORK_JOINED:
-                        self.board.modes = [modes.ShowIPAddress(None)]
-                    else:
-                        self.mode_cancel_timer = 10
-                elif self.mode != UpdateModes.NORMAL:
-                    self.config_mode.set_edges_from_int(self.mode_cancel_timer)
-                    self.mode_cancel_timer -= 1
-                    if self.mode_cancel_timer < 0:
-                        self.reset_config()
-                #
-                logs = self.update_board()
-                #
-                self.current_offset += self.simulation_offset
-            except KeyboardInterrupt:
-                print('CTRL-C detected')
-                break
-            if os.path.getmtime('config/config.sh') != last_config_time:
-                sys.exit(2)
-
-        if self.lights and self.board.lights:
-            self.board.lights.clear_strip()
-            self.board.lights.update_strip()
+                if self.lights and self.board.lights:
+                    self.board.lights.clear_strip()
+                    self.board.lights.update_strip()
+                    # Make sure the clear has been sent before exiting
+                    self.board.close_lights()
+            finally:
+                self.board.stop_recording()
+        if exit_code == 2:
+            sys.exit(2)
 
     def action_button_press(self) -> None:
         """Move to the next edge mode"""
@@ -123,6 +321,9 @@ class Updater:
         #
         # Reset the modes
         self.mode = UpdateModes.NORMAL
+        if self.wifi_task:
+            self.wifi_task.cancel()
+            self.wifi_task = None
         self.wifi_config.go_idle()
         self.board.modes = self.old_modes
         if self.config_mode.on:
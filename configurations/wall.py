@@ -0,0 +1,30 @@
+import matrix_display
+import matrix_modes
+from matrix_common import Panel, Wiring
+from matrix_modes import *
+
+def get_layout() -> tuple[GRID, list[Panel]]:
+    """A 32x32 wall of four 16x16 panels chained in a U, with the bottom two upside down"""
+    return GRID(32, 32), [
+        Panel(COORD(0, 0), GRID(16, 16), Wiring.COLUMN_SERPENTINE),
+        Panel(COORD(0, 16), GRID(16, 16), Wiring.COLUMN_SERPENTINE),
+        Panel(COORD(16, 16), GRID(16, 16), Wiring.COLUMN_SERPENTINE, rotation=180),
+        Panel(COORD(16, 0), GRID(16, 16), Wiring.COLUMN_SERPENTINE, rotation=180),
+    ]
+
+def get_modes(board: matrix_display.DisplayMatrix) -> list[matrix_modes.Mode]:
+    return [
+            CycleColors(
+                board.lights.get_edge_coords(),
+                [RED, BLUE, GREEN]
+            ),
+            CycleColors(
+                board.lights.get_ring_coords(8),
+                [ORANGE, YELLOW]
+            ),
+            CycleColors(
+                board.lights.get_box_coords(COORD(12, 12), GRID(8, 8)),
+                [YELLOW, WHITE],
+                synchronized=True
+            ),
+    ]
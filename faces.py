@@ -24,6 +24,14 @@ class Word:
         else:
             return term.grey(self.word.upper()) if terminal_mode else ' ' * len(self.word)
 
+    def show_cells(self, term: blessed.Terminal, terminal_mode: bool=True) -> list[tuple[str, str]]:
+        """Return the (style, character) cells that show the word"""
+        if terminal_mode:
+            style = term.red if self.on else term.grey
+            return [(style, letter) for letter in self.word.upper()]
+        else:
+            return [('', letter) for letter in self.show(term, False)]
+
 
 class Unused(Word):
     is_used = False
@@ -0,0 +1,213 @@
+"""Watching files for changes so they don't need checking on every update
+
+One watcher is shared by everything in the process. On Linux it uses
+inotify on the folders holding the files, elsewhere (or if inotify can't
+be used) it falls back to checking the size and modified time of the
+files. Parsed JSON is cached until the file changes.
+
+If the watcher isn't running (eg in tests or one off scripts) then the
+files are checked whenever they are asked about, so the answers are
+always up to date.
+"""
+import asyncio
+import json
+import os
+import pathlib
+import struct
+import sys
+from collections.abc import Callable
+from typing import Any
+
+try:
+    import ctypes
+    import ctypes.util
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+except (ImportError, OSError, AttributeError):
+    libc = None    # type: ignore[assignment]
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE
+EVENT = struct.Struct('iIII')     # watch descriptor, mask, cookie, length of name
+
+Subscriber = Callable[[pathlib.Path], None]
+
+
+class WatchedFile:
+    """What is known about a file being watched"""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Initialise the file"""
+        self.path = path
+        self.version = 0
+        self.signature = self.get_signature()
+        self.subscribers: list[Subscriber] = []
+        self.data: Any = None
+        self.data_version: int|None = None
+
+    def get_signature(self) -> tuple[int, int]|None:
+        """Return what the stat says about the file, None if it doesn't exist"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """Watches files, telling subscribers when they change"""
+
+    def __init__(self, poll_interval: float=0.5, use_inotify: bool=True) -> None:
+        """Initialise the watcher"""
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and libc is not None and sys.platform == 'linux'
+        self.files: dict[pathlib.Path, WatchedFile] = {}
+        self.running = False
+        self.inotify_fd: int|None = None
+        self.folder_watches: dict[int, pathlib.Path] = {}
+        self.polled: set[pathlib.Path] = set()
+
+    def watch(self, filename: str|pathlib.Path) -> WatchedFile:
+        """Start watching a file, returning what is known about it"""
+        path = pathlib.Path(filename).absolute()
+        if path not in self.files:
+            self.files[path] = WatchedFile(path)
+            if not (self.inotify_fd is not None and self.add_folder_watch(path.parent)):
+                self.polled.add(path)
+        return self.files[path]
+
+    def subscribe(self, filename: str|pathlib.Path, subscriber: Subscriber) -> None:
+        """Call the subscriber with the path whenever the file changes"""
+        self.watch(filename).subscribers.append(subscriber)
+
+    def unsubscribe(self, filename: str|pathlib.Path, subscriber: Subscriber) -> None:
+        """Stop calling the subscriber when the file changes"""
+        watched = self.watch(filename)
+        if subscriber in watched.subscribers:
+            watched.subscribers.remove(subscriber)
+
+    def get_version(self, filename: str|pathlib.Path) -> int:
+        """Return a number that goes up every time the file changes"""
+        watched = self.watch(filename)
+        if not self.running:
+            self.poll([watched.path])
+        return watched.version
+
+    def get_json(self, filename: str|pathlib.Path) -> Any:
+        """Return the parsed contents of a JSON file, only reading it again if it has changed
+
+        The same object is returned until the file changes so it mustn't be
+        altered. Errors reading or parsing the file are raised.
+        """
+        watched = self.watch(filename)
+        version = self.get_version(filename)
+        if watched.data_version != version:
+            with open(watched.path, 'r') as f:
+                watched.data = json.load(f)
+            watched.data_version = version
+        return watched.data
+
+    def poll(self, paths: list[pathlib.Path]|set[pathlib.Path]) -> None:
+        """Check whether any of the files have changed by looking at them"""
+        changed = []
+        for path in paths:
+            watched = self.files[path]
+            signature = watched.get_signature()
+            if signature != watched.signature:
+                watched.signature = signature
+                changed.append(path)
+        self.notify(changed)
+
+    def notify(self, paths: list[pathlib.Path]) -> None:
+        """Record that the files changed and tell the subscribers"""
+        for path in paths:
+            watched = self.files[path]
+            watched.version += 1
+            for subscriber in list(watched.subscribers):
+                subscriber(path)
+
+    #
+    # Using inotify
+
+    def start_inotify(self) -> None:
+        """Start watching the folders of the files with inotify, if possible"""
+        if not self.use_inotify or libc is None:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        self.inotify_fd = fd
+        for path in list(self.polled):
+            if self.add_folder_watch(path.parent):
+                self.polled.discard(path)
+
+    def add_folder_watch(self, folder: pathlib.Path) -> bool:
+        """Watch a folder with inotify, returning whether it worked"""
+        if folder in self.folder_watches.values():
+            return True
+        if libc is None or self.inotify_fd is None:
+            return False
+        wd = libc.inotify_add_watch(self.inotify_fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            return False
+        self.folder_watches[wd] = folder
+        return True
+
+    def read_events(self) -> None:
+        """Read the waiting inotify events and tell the subscribers about the files that changed"""
+        assert self.inotify_fd is not None
+        try:
+            data = os.read(self.inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0')
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Lost track so check them all
+                self.poll(list(self.files))
+                return
+            if wd in self.folder_watches:
+                path = self.folder_watches[wd] / os.fsdecode(name)
+                if path in self.files and path not in changed:
+                    self.files[path].signature = self.files[path].get_signature()
+                    changed.append(path)
+        self.notify(changed)
+
+    def stop_inotify(self) -> None:
+        """Stop using inotify"""
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+            self.polled.update(path for path in self.files if path.parent in self.folder_watches.values())
+            self.folder_watches = {}
+
+    async def run(self) -> None:
+        """Watch the files until cancelled"""
+        loop = asyncio.get_running_loop()
+        self.start_inotify()
+        if self.inotify_fd is not None:
+            loop.add_reader(self.inotify_fd, self.read_events)
+        self.running = True
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                if self.polled:
+                    self.poll(self.polled)
+        finally:
+            self.running = False
+            if self.inotify_fd is not None:
+                loop.remove_reader(self.inotify_fd)
+            self.stop_inotify()
+
+
+watcher = FileWatcher()
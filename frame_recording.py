@@ -0,0 +1,227 @@
+"""Recording frames of the clock to a compact binary file
+
+The file starts with a header giving the size of the grid and whether the
+frames are compressed. Each frame is then a fixed size record of the
+timestamp, the button flags and the packed RGB colors of every light,
+row by row. Compressed files hold the records in zlib compressed chunks.
+
+Recording to an existing file adds the frames to the end of it, so a
+restart or a change of face keeps what was recorded before.
+"""
+import json
+import os
+import pathlib
+import re
+import struct
+import time
+import zlib
+from typing import BinaryIO, Iterator, NamedTuple
+
+import click
+
+
+MAGIC = b'WCFR'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHH')     # magic, version, compressed, rows, cols
+RECORD = struct.Struct('<dB')         # timestamp, button flags
+CHUNK = struct.Struct('<I')           # length of a compressed chunk
+
+MODE_BUTTON = 1
+ACTION_BUTTON = 2
+
+
+class FrameRecordingError(Exception):
+    """The recording could not be read"""
+
+
+class RecordedFrame(NamedTuple):
+    timestamp: float
+    mode_button: bool
+    action_button: bool
+    colors: bytes
+
+    def get_light_data(self, cols: int) -> list[list[tuple[int, int, int]]]:
+        """Return the colors as rows of RGB tuples"""
+        pixels = [tuple(self.colors[idx:idx + 3]) for idx in range(0, len(self.colors), 3)]
+        return [pixels[idx:idx + cols] for idx in range(0, len(pixels), cols)]  # type: ignore
+
+
+class FrameRecorder:
+    """Appends frames to a recording file"""
+
+    def __init__(self, filename: pathlib.Path, rows: int, cols: int, compress: bool=False,
+                 chunk_frames: int=64, append: bool=True) -> None:
+        """Initialise the recorder, adding to the end of the file unless told not to"""
+        self.rows = rows
+        self.cols = cols
+        self.frame_size = rows * cols * 3
+        self.compress = compress
+        self.chunk_frames = chunk_frames
+        self.chunk: list[bytes] = []
+        header = HEADER.pack(MAGIC, VERSION, compress, rows, cols)
+        self.file: BinaryIO = self.open_file(filename, header) if append else self.start_file(filename, header)
+
+    def start_file(self, filename: pathlib.Path, header: bytes) -> BinaryIO:
+        """Open a new recording file"""
+        f = open(filename, 'wb')
+        f.write(header)
+        return f
+
+    def open_file(self, filename: pathlib.Path, header: bytes) -> BinaryIO:
+        """Open the recording file to add frames to the end of it
+
+        A file with a different grid or compression is moved aside to a name
+        with the time in it and a new file started. Anything after the last
+        whole record or chunk (eg if the power went while it was being
+        written) is cut off so the new frames line up.
+        """
+        try:
+            f = open(filename, 'r+b')
+        except FileNotFoundError:
+            return self.start_file(filename, header)
+        if f.read(HEADER.size) != header:
+            f.close()
+            if filename.stat().st_size:
+                os.replace(filename, get_rotated_filename(filename))
+            return self.start_file(filename, header)
+        f.truncate(self.get_whole_length(f))
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def get_whole_length(self, f: BinaryIO) -> int:
+        """Return the length of the file up to the end of the last whole record or chunk"""
+        size = f.seek(0, os.SEEK_END)
+        if not self.compress:
+            record_size = RECORD.size + self.frame_size
+            return HEADER.size + (size - HEADER.size) // record_size * record_size
+        position = HEADER.size
+        f.seek(position)
+        while len(length := f.read(CHUNK.size)) == CHUNK.size:
+            end = position + CHUNK.size + CHUNK.unpack(length)[0]
+            if end > size:
+                break
+            position = end
+            f.seek(position)
+        return position
+
+    def write_frame(self, colors: bytes, mode_button: bool=False, action_button: bool=False,
+                    timestamp: float|None=None) -> None:
+        """Record a frame of packed RGB colors"""
+        if len(colors) != self.frame_size:
+            raise ValueError(f'Frame has {len(colors)} bytes but should have {self.frame_size}')
+        flags = (MODE_BUTTON if mode_button else 0) | (ACTION_BUTTON if action_button else 0)
+        record = RECORD.pack(time.time() if timestamp is None else timestamp, flags) + colors
+        if not self.compress:
+            self.file.write(record)
+        else:
+            self.chunk.append(record)
+            if len(self.chunk) >= self.chunk_frames:
+                self.write_chunk()
+
+    def write_chunk(self) -> None:
+        """Write out the frames waiting to be compressed"""
+        if self.chunk:
+            data = zlib.compress(b''.join(self.chunk))
+            self.file.write(CHUNK.pack(len(data)) + data)
+            self.chunk = []
+
+    def close(self) -> None:
+        """Finish the recording"""
+        if not self.file.closed:
+            self.write_chunk()
+            self.file.close()
+
+
+def get_rotated_filename(filename: pathlib.Path) -> pathlib.Path:
+    """Return a name, not already used, to move an old recording to"""
+    stem = f'{filename.stem}-{time.strftime("%Y%m%d-%H%M%S")}'
+    rotated = filename.with_name(stem + filename.suffix)
+    number = 1
+    while rotated.exists():
+        rotated = filename.with_name(f'{stem}-{number}{filename.suffix}')
+        number += 1
+    return rotated
+
+
+class FrameReader:
+    """Reads the frames back from a recording file"""
+
+    def __init__(self, filename: pathlib.Path) -> None:
+        """Initialise the reader"""
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise FrameRecordingError(f'{filename} is too short to be a recording')
+        magic, version, compressed, self.rows, self.cols = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise FrameRecordingError(f'{filename} is not a frame recording')
+        self.compressed = bool(compressed)
+        self.record_size = RECORD.size + self.rows * self.cols * 3
+
+    def __iter__(self) -> Iterator[RecordedFrame]:
+        """Iterate through the frames"""
+        with open(self.filename, 'rb') as f:
+            f.seek(HEADER.size)
+            if not self.compressed:
+                while len(record := f.read(self.record_size)) == self.record_size:
+                    yield self.decode_record(record)
+            else:
+                while len(length := f.read(CHUNK.size)) == CHUNK.size:
+                    data = zlib.decompress(f.read(CHUNK.unpack(length)[0]))
+                    for idx in range(0, len(data), self.record_size):
+                        yield self.decode_record(data[idx:idx + self.record_size])
+
+    def decode_record(self, record: bytes) -> RecordedFrame:
+        """Return the frame held in a record"""
+        timestamp, flags = RECORD.unpack_from(record)
+        return RecordedFrame(timestamp, bool(flags & MODE_BUTTON), bool(flags & ACTION_BUTTON),
+                             record[RECORD.size:])
+
+
+def convert_json_frames(folder: pathlib.Path, filename: pathlib.Path, compress: bool=False) -> int:
+    """Convert a folder of frame-N.json files to a recording, returning the number of frames"""
+    json_files = sorted(folder.glob('frame-*.json'), key=lambda path: int(re.findall(r'\d+', path.stem)[0]))
+    recorder: FrameRecorder|None = None
+    for json_file in json_files:
+        with open(json_file, 'r') as f:
+            frame = json.load(f)
+        light_data = frame['light-data']
+        if recorder is None:
+            recorder = FrameRecorder(filename, len(light_data), len(light_data[0]), compress, append=False)
+        mode_button, action_button = frame['button-data']
+        colors = bytes(value for row in light_data for color in row for value in color)
+        recorder.write_frame(colors, mode_button, action_button, json_file.stat().st_mtime)
+    if recorder:
+        recorder.close()
+    return len(json_files)
+
+
+@click.group()
+def cli() -> None:
+    """Tools for frame recordings"""
+
+
+@cli.command()
+@click.argument('folder', type=click.Path(exists=True, file_okay=False))
+@click.argument('filename', type=click.Path())
+@click.option('--compress', is_flag=True, help='Compress the frames')
+def convert(folder: str, filename: str, compress: bool) -> None:
+    """Convert a folder of JSON frames to a recording"""
+    number = convert_json_frames(pathlib.Path(folder), pathlib.Path(filename), compress)
+    print(f'Converted {number} frames')
+
+
+@cli.command()
+@click.argument('filename', type=click.Path(exists=True, dir_okay=False))
+def info(filename: str) -> None:
+    """Show the details of a recording"""
+    reader = FrameReader(pathlib.Path(filename))
+    frames = list(reader)
+    print(f'Grid {reader.rows}x{reader.cols}, compressed={reader.compressed}, frames={len(frames)}')
+    if frames:
+        print(f'Duration {frames[-1].timestamp - frames[0].timestamp:.1f}s')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,154 @@
+"""Driving several LED strips as one, sending to them at the same time
+
+Each strip (eg a Pi5Neo on its own SPI device) sends its pixels one after
+the other, so one long strip gets slower as it gets longer. Splitting the
+LEDs across strips and sending to them all at once from a thread pool keeps
+the time to send a frame the same as more strips are added.
+"""
+import concurrent.futures
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections.abc import Callable, Sequence
+from typing import Any
+
+
+def send_frame(leds: Any, frame: bytes, sleep_duration: float=0.1) -> None:
+    """Send packed RGB bytes, in the order of the strip, to the LEDs and show them
+
+    Drivers that can take the whole frame at once have a set_frame method,
+    the others have the colors set one LED at a time. Pi5Neo has no public
+    way to take a whole frame, so it is one of the others.
+    """
+    if hasattr(type(leds), 'set_frame'):
+        leds.set_frame(frame)
+    else:
+        values = iter(frame)
+        for idx, color in enumerate(zip(values, values, values)):
+            leds.set_led_color(idx, *color)
+    leds.update_strip(sleep_duration)
+
+
+class StripGroup:
+    """Several LED strips that look like one long strip
+
+    This has the same methods as a Pi5Neo strip. The colors are set in a back
+    buffer and update_strip hands a copy of each strip's part to a thread
+    which sends it, so the next frame can be worked out while this one is
+    being sent. A strip only has one frame being sent at a time, and parts
+    which haven't changed since they were last sent aren't sent again. If
+    sending to a strip fails the error is raised by the next update_strip
+    (or wait) and the strip is sent its colors again.
+    """
+
+    def __init__(self, strips: Sequence[Any], lengths: Sequence[int]) -> None:
+        """Initialise the group from the strip drivers (None if missing) and how many LEDs each has"""
+        if len(strips) != len(lengths):
+            raise ValueError('Need a length for each strip')
+        self.strips = list(strips)
+        self.num_leds = sum(lengths)
+        self.parts: list[tuple[int, int]] = []
+        start = 0
+        for length in lengths:
+            self.parts.append((start * 3, (start + length) * 3))
+            start += length
+        self.buffer = bytearray(self.num_leds * 3)
+        self.sent: list[bytes|None] = [None] * len(self.strips)      # What the strips were last sent
+        self.sending: list[bytes|None] = [None] * len(self.strips)   # What the pending sends are sending
+        self.pending: list[Future[None]|None] = [None] * len(self.strips)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.strips)), thread_name_prefix='led-strip')
+
+    def clear_strip(self) -> None:
+        self.fill_strip(0, 0, 0)
+
+    def fill_strip(self, red: int=0, green: int=0, blue: int=0) -> None:
+        self.buffer[:] = bytes((red, green, blue)) * self.num_leds
+
+    def set_led_color(self, index: int, red: int, green: int, blue: int) -> bool:
+        if 0 <= index < self.num_leds:
+            self.buffer[index * 3:index * 3 + 3] = bytes((red, green, blue))
+            return True
+        return False
+
+    def set_frame(self, data: bytes) -> None:
+        """Set every LED from packed RGB bytes in strip order"""
+        if len(data) != len(self.buffer):
+            raise ValueError(f'Frame has {len(data)} bytes but the strips need {len(self.buffer)}')
+        self.buffer[:] = data
+
+    def update_strip(self, sleep_duration: float=0.1) -> None:
+        """Start sending the colors to the strips, raising the error if an earlier send failed"""
+        for idx, pending in enumerate(self.pending):
+            if pending and pending.done():
+                self.finish(idx)
+        for idx, (strip, (start, end)) in enumerate(zip(self.strips, self.parts)):
+            part = bytes(self.buffer[start:end])
+            pending = self.pending[idx]
+            if strip is None or part == (self.sending[idx] if pending else self.sent[idx]):
+                continue
+            if pending:
+                # Only one frame at a time on a strip, so wait for the last one to go
+                self.finish(idx)
+            pending = self.executor.submit(send_frame, strip, part, sleep_duration)
+            pending.add_done_callback(functools.partial(self.mark_sent, idx, part))
+            self.pending[idx] = pending
+            self.sending[idx] = part
+
+    def mark_sent(self, idx: int, part: bytes, pending: Future[None]) -> None:
+        """Remember what a strip was sent, once it has been sent without error"""
+        if not pending.cancelled() and pending.exception() is None:
+            self.sent[idx] = part
+
+    def finish(self, idx: int) -> None:
+        """Wait for the send to a strip to finish, raising its error if it failed"""
+        pending, self.pending[idx] = self.pending[idx], None
+        if pending is None:
+            return
+        error = pending.exception()
+        if error:
+            # Send the strip its colors again next time
+            self.sent[idx] = None
+            raise error
+
+    def wait(self) -> None:
+        """Wait until all the strips have been sent their colors, raising the first error"""
+        concurrent.futures.wait([pending for pending in self.pending if pending])
+        errors: list[BaseException] = []
+        for idx in range(len(self.pending)):
+            try:
+                self.finish(idx)
+            except Exception as err:
+                errors.append(err)
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        """Finish sending, stop the threads and close the strips"""
+        try:
+            self.wait()
+        finally:
+            self.executor.shutdown()
+            for strip in self.strips:
+                if strip is not None:
+                    close_strip(strip)
+
+
+def close_strip(leds: Any) -> None:
+    """Let go of a strip's device, if it has one to let go of"""
+    # Pi5Neo keeps the SPI device open without a close of its own
+    close = getattr(leds, 'close', None) or getattr(getattr(leds, 'spi', None), 'close', None)
+    if close:
+        close()
+
+
+def split_strip(num_leds: int, parts: int) -> list[int]:
+    """Return how many LEDs go on each strip when a strip is split as evenly as possible, longest first"""
+    size, remainder = divmod(num_leds, parts)
+    return [size + 1 if idx < remainder else size for idx in range(parts)]
+
+
+def open_strips(devices: Sequence[str], num_leds: int, open_strip: Callable[[str, int], Any]) -> Any:
+    """Open the LEDs split along the devices in order, just the strip itself if there is only one device"""
+    if len(devices) == 1:
+        return open_strip(devices[0], num_leds)
+    lengths = split_strip(num_leds, len(devices))
+    return StripGroup([open_strip(device, length) for device, length in zip(devices, lengths)], lengths)
@@ -1,5 +1,8 @@
+import enum
+import functools
 from collections import namedtuple
-from typing import Iterator, NamedTuple
+from operator import itemgetter
+from typing import Callable, Iterator, NamedTuple, Sequence
 
 
 class GRID(NamedTuple):
@@ -19,6 +22,88 @@ YELLOW = COLOR(0, 255, 255)
 
 
 
+class Wiring(enum.Enum):
+    COLUMN_SERPENTINE = 'column-serpentine'   # Down the first column, up the next and so on
+    ROW_MAJOR = 'row-major'                   # Along each row from the left
+    ROW_SERPENTINE = 'row-serpentine'         # Along the first row, back along the next and so on
+
+
+class Panel(NamedTuple):
+    offset: COORD           # Where the top left of the panel is on the canvas
+    size: GRID              # Rows and columns of the panel the way it is wired
+    wiring: Wiring
+    rotation: int = 0       # Degrees the panel is turned clockwise on the canvas
+    device: str|None = None # SPI device the panel is on, None for the default one
+
+    def get_canvas_size(self) -> GRID:
+        """Return the size the panel takes up on the canvas"""
+        if self.rotation in (90, 270):
+            return GRID(self.size.cols, self.size.rows)
+        return self.size
+
+    def get_canvas_coords(self, row: int, col: int) -> COORD:
+        """Return where a light on the panel is on the canvas"""
+        rows, cols = self.size
+        match self.rotation:
+            case 0:
+                pass
+            case 90:
+                row, col = col, rows - 1 - row
+            case 180:
+                row, col = rows - 1 - row, cols - 1 - col
+            case 270:
+                row, col = cols - 1 - col, row
+            case _:
+                raise ValueError(f'Panels can only be rotated by a multiple of 90 degrees, not {self.rotation}')
+        return COORD(self.offset.row + row, self.offset.col + col)
+
+
+@functools.cache
+def get_led_order(size: GRID, wiring: Wiring=Wiring.COLUMN_SERPENTINE) -> tuple[int, ...]:
+    """Return the index (row by row) of the light wired to each LED along the strip"""
+    order: list[int] = []
+    if wiring == Wiring.COLUMN_SERPENTINE:
+        for col in range(size.cols):
+            rows = range(size.rows) if col % 2 == 0 else range(size.rows - 1, -1, -1)
+            order.extend(row * size.cols + col for row in rows)
+    else:
+        for row in range(size.rows):
+            cols = range(size.cols)
+            if wiring == Wiring.ROW_SERPENTINE and row % 2 == 1:
+                cols = range(size.cols - 1, -1, -1)
+            order.extend(row * size.cols + col for col in cols)
+    return tuple(order)
+
+
+@functools.cache
+def get_tiled_led_order(size: GRID, panels: tuple[Panel, ...]) -> tuple[int, ...]:
+    """Return the index (row by row) of the light wired to each LED when panels are chained on one strip"""
+    order: list[int] = []
+    for panel in panels:
+        for idx in get_led_order(panel.size, panel.wiring):
+            row, col = panel.get_canvas_coords(idx // panel.size.cols, idx % panel.size.cols)
+            if not (0 <= row < size.rows and 0 <= col < size.cols):
+                raise OutOfGridRange(f'Panel at {panel.offset} does not fit in {size}')
+            order.append(row * size.cols + col)
+    return tuple(order)
+
+
+def check_panels(size: GRID, panels: Sequence[Panel]) -> None:
+    """Raise ValueError unless the panels cover the canvas exactly, inside it and without overlapping"""
+    covered: set[COORD] = set()
+    for panel in panels:
+        for row in range(panel.size.rows):
+            for col in range(panel.size.cols):
+                coord = panel.get_canvas_coords(row, col)
+                if not (0 <= coord.row < size.rows and 0 <= coord.col < size.cols):
+                    raise ValueError(f'Panel at {panel.offset} does not fit in {size}')
+                if coord in covered:
+                    raise ValueError(f'Panel at {panel.offset} overlaps another panel at {coord}')
+                covered.add(coord)
+    if len(covered) != size.rows * size.cols:
+        raise ValueError(f'Panels only cover {len(covered)} of the {size.rows * size.cols} lights')
+
+
 class NoSuchLight(Exception):
     """A light was not found"""
 
@@ -127,3 +212,156 @@ class LightCollection:
     def __len__(self) -> int:
         """Return the number of lights"""
         return self.size.rows * self.size.cols
+
+    def fill(self, color: COLOR, on: bool|None=True) -> None:
+        """Set all the lights to the same color"""
+        for light in self:
+            light.set_color(color, on)
+
+    def copy(self) -> 'LightCollection':
+        """Return a copy of the collection with the same lights set"""
+        result = self.__class__(self.size)
+        for light, new_light in zip(self, result):
+            new_light.set_color(light.color, light.on)
+        return result
+
+    def get_shown_bytes(self) -> bytes:
+        """Return the shown colors of all the lights, row by row, as packed RGB bytes"""
+        return b''.join(color_to_bytes(light.get_shown_color()) for light in self)
+
+    def diff(self, other: 'LightCollection') -> list[int]:
+        """Return the indexes (row by row) of the lights that show a different color to the other collection"""
+        mine, theirs = self.get_shown_bytes(), other.get_shown_bytes()
+        if mine == theirs:
+            return []
+        return [idx for idx in range(len(self)) if mine[idx * 3:idx * 3 + 3] != theirs[idx * 3:idx * 3 + 3]]
+
+    def export(self, order: Sequence[int]) -> bytes:
+        """Return the shown colors as packed RGB bytes with the lights in the given order
+
+        The order gives the index (row by row) of the light to use for each position
+        in the output, so it can be used to match the wiring order of an LED strip.
+        """
+        key = tuple(order)
+        if not key:
+            return b''
+        return bytes(get_exporter(key)(self.get_shown_bytes()))
+
+    def set_colors(self, locations: Sequence[COORD], data: bytes) -> None:
+        """Set the colors of the lights at the locations from packed RGB bytes in the same order"""
+        for idx, location in enumerate(locations):
+            self.get_light_at(location).set_color(COLOR(*data[idx * 3:idx * 3 + 3]))
+
+
+def color_to_bytes(color: COLOR) -> bytes:
+    """Return a color as packed RGB bytes, with each channel made a whole number from 0 to 255"""
+    return bytes(min(255, max(0, int(channel))) for channel in color)
+
+
+@functools.lru_cache(maxsize=16)
+def get_exporter(order: tuple[int, ...]) -> Callable[[bytes], tuple[int, ...]]:
+    """Return a function picking the bytes of the lights in the order out of the packed RGB bytes of all of them"""
+    return itemgetter(*[idx * 3 + part for idx in order for part in range(3)])
+
+
+@functools.lru_cache(maxsize=64)
+def get_loader(size: GRID, locations: tuple[COORD, ...]) -> tuple[Callable[[bytes], tuple[int, ...]], int]:
+    """Return the byte picker and on mask to load colors for the locations into a collection of the size
+
+    The picker takes the current colors followed by the new colors and picks
+    each byte of the new color buffer from one or the other.
+    """
+    number = size.rows * size.cols * 3
+    picks = list(range(number))
+    on_mask = bytearray(number)
+    for idx, location in enumerate(locations):
+        if not (0 <= location.row < size.rows and 0 <= location.col < size.cols):
+            raise NoSuchLight(f'No light found at {location}')
+        offset = (location.row * size.cols + location.col) * 3
+        for part in range(3):
+            picks[offset + part] = number + idx * 3 + part
+        on_mask[offset:offset + 3] = LIGHT_ON
+    return itemgetter(*picks), int.from_bytes(on_mask, 'big')
+
+
+LIGHT_ON = b'\xff\xff\xff'
+LIGHT_OFF = b'\x00\x00\x00'
+
+
+class LightView(Light):
+    """A light whose color and on state are held in an ArrayLightCollection"""
+
+    def __init__(self, collection: 'ArrayLightCollection', index: int) -> None:
+        """Initialise the light"""
+        self.collection = collection
+        self.offset = index * 3
+
+    @property
+    def on(self) -> bool:
+        return self.collection.on_mask[self.offset] != 0
+
+    @on.setter
+    def on(self, value: bool) -> None:
+        self.collection.on_mask[self.offset:self.offset + 3] = LIGHT_ON if value else LIGHT_OFF
+
+    @property
+    def color(self) -> COLOR:
+        return COLOR(*self.collection.colors[self.offset:self.offset + 3])
+
+    @color.setter
+    def color(self, value: COLOR) -> None:
+        self.collection.colors[self.offset:self.offset + 3] = color_to_bytes(value)
+
+
+class ArrayLightCollection(LightCollection):
+    """A collection of lights where the colors are held in one contiguous buffer
+
+    The colors are packed RGB bytes, row by row, with a matching mask that
+    is all ones for lights that are on, so whole frame operations work on
+    the buffers in bulk rather than light by light.
+    """
+
+    def __init__(self, size: GRID):
+        """Initialise the collection"""
+        number = size.rows * size.cols
+        self.colors = bytearray(bytes(WHITE) * number)
+        self.on_mask = bytearray(number * 3)
+        self.size = size
+        self.lights = [
+            [LightView(self, row * size.cols + col) for col in range(size.cols)]
+            for row in range(size.rows)
+        ]
+
+    def fill(self, color: COLOR, on: bool|None=True) -> None:
+        """Set all the lights to the same color"""
+        self.colors[:] = color_to_bytes(color) * len(self)
+        if on is not None:
+            self.on_mask[:] = (LIGHT_ON if on else LIGHT_OFF) * len(self)
+
+    def copy(self) -> 'ArrayLightCollection':
+        """Return a copy of the collection with the same lights set"""
+        result = ArrayLightCollection(self.size)
+        result.colors[:] = self.colors
+        result.on_mask[:] = self.on_mask
+        return result
+
+    def get_shown_bytes(self) -> bytes:
+        """Return the shown colors of all the lights, row by row, as packed RGB bytes"""
+        length = len(self.colors)
+        shown = int.from_bytes(self.colors, 'big') & int.from_bytes(self.on_mask, 'big')
+        return shown.to_bytes(length, 'big')
+
+    def set_colors(self, locations: Sequence[COORD], data: bytes) -> None:
+        """Set the colors of the lights at the locations from packed RGB bytes in the same order
+
+        The first time a set of locations is seen a loader is made that picks each
+        byte of the new color buffer from either the current colors or the data,
+        so every later frame is loaded in one go.
+        """
+        key = tuple(locations)
+        if not key:
+            return
+        loader, on_mask = get_loader(self.size, key)
+        self.colors[:] = bytes(loader(bytes(self.colors) + data))
+        shown = int.from_bytes(self.on_mask, 'big') | on_mask
+        self.on_mask[:] = shown.to_bytes(len(self.on_mask), 'big')
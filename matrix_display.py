@@ -2,16 +2,21 @@
 import time
 import pathlib
 import importlib
+import queue
+import threading
 from types import FrameType
-from typing import Any
+from typing import Any, Sequence
 
 import click
 import blessed
 from matrix_modes import Mode, CycleColors, ShowImage
 from matrix_common import *
 import configurations
+import mode_profiler
+from led_strips import StripGroup, send_frame
 import signal
-import sys
+import startup_timeline
+import terminal_renderer
 
 
 # Load LED control stuff if it is there
@@ -21,103 +26,332 @@ try:
 except ImportError:
     pi5neo = None
 
-def get_matrix_leds(n: int) -> Any:
+DEFAULT_DEVICE = '/dev/spidev0.0'
+
+def get_matrix_leds(n: int, device: str=DEFAULT_DEVICE) -> Any:
     if pi5neo:
-        return pi5neo.Pi5Neo('/dev/spidev0.0', n, baud_rate)
+        return pi5neo.Pi5Neo(device, n, baud_rate)
     else:
         return None
 
 
+class FrameScheduler:
+    """Works out which modes are due to update, using the monotonic clock
+
+    Each mode is due again one of its own intervals after it was last due,
+    rather than after it actually ran, so timing doesn't drift. If a mode
+    falls behind then the updates it missed are counted as dropped frames.
+    """
+
+    def __init__(self, modes: list[Mode], interval: float) -> None:
+        """Initialise the scheduler"""
+        self.modes = modes
+        self.interval = interval
+        self.due_times: dict[Mode, float] = {}
+        self.dropped_frames = 0
+
+    def get_due_modes(self, now: float) -> list[Mode]:
+        """Return the modes that are due to update now and work out when they are next due"""
+        due_modes = []
+        for mode in self.modes:
+            due = self.due_times.setdefault(mode, now)
+            if due > now:
+                continue
+            due_modes.append(mode)
+            next_due = mode.get_next_update_time(due, self.interval)
+            if next_due <= now:
+                # Fell behind so skip the updates that were missed
+                step = next_due - due
+                if step > 0:
+                    missed = int((now - next_due) // step) + 1
+                    next_due += missed * step
+                else:
+                    missed = 1
+                    next_due = now
+                self.dropped_frames += missed
+            self.due_times[mode] = next_due
+        return due_modes
+
+    def get_next_due_time(self, now: float) -> float:
+        """Return when the next mode will be due"""
+        return min((self.due_times.get(mode, now) for mode in self.modes), default=now + self.interval)
+
+
+class LedStrip:
+    """An LED strip showing part of the frame"""
+
+    def __init__(self, device: str, leds: Any, start: int, end: int) -> None:
+        """Initialise the strip"""
+        self.device = device
+        self.leds = leds
+        self.start = start      # Where the strip's colors are in the frame bytes
+        self.end = end
+
+
 class DisplayMatrix:
     """Represents the matrix being displayed"""
 
-    def __init__(self, size: GRID, modes: list[Mode]) -> None:
-        """Initialise the matrix"""
+    def __init__(self, size: GRID, modes: list[Mode], wiring: Wiring=Wiring.COLUMN_SERPENTINE,
+                 panels: Sequence[Panel]|None=None, parallel_output: bool=False) -> None:
+        """Initialise the matrix
+
+        The matrix is a canvas that the modes draw on, shown by one or more
+        panels. Panels on the same device are chained along one strip in the
+        order given. Without any panels the whole canvas is one panel. With
+        parallel output the strips are sent to at the same time from other
+        threads, while the next frame is worked out.
+        """
         self.term = blessed.Terminal()
         self.size = size
-        self.lights = LightCollection(size)
+        self.panels = tuple(panels) if panels else (Panel(COORD(0, 0), size, wiring),)
+        check_panels(size, self.panels)
+        self.lights = ArrayLightCollection(size)
         self.modes = modes
+        self.renderer = terminal_renderer.TerminalRenderer(self.term)
+        self.cells: dict[bytes, terminal_renderer.Cell] = {}
         #
-        # Initialise the hardware lights if we have them
-        self.matrix_leds = get_matrix_leds(size.rows * size.cols)
-
-    def display_board(self) -> None:
-        """Update the display of the board"""
-        print(self.term.home + self.term.clear)
-        for row in self.lights.rows():
-            for light in row:
-                color = light.get_shown_color()
-                print(self.term.color_rgb(*color) + "■", end="")
-            print('')
+        # Work out the order of the LEDs on all the strips, so one export gives the whole
+        # frame, and initialise the hardware lights if we have them
+        devices: dict[str, list[Panel]] = {}
+        for panel in self.panels:
+            devices.setdefault(panel.device or DEFAULT_DEVICE, []).append(panel)
+        led_order: list[int] = []
+        self.strips: list[LedStrip] = []
+        for device, device_panels in devices.items():
+            order = get_tiled_led_order(size, tuple(device_panels))
+            start = len(led_order) * 3
+            led_order.extend(order)
+            self.strips.append(LedStrip(device, get_matrix_leds(len(order), device), start, len(led_order) * 3))
+        self.led_order = tuple(led_order)
+        self.output: StripGroup|None = None
+        if parallel_output and self.has_leds():
+            self.output = StripGroup([strip.leds for strip in self.strips],
+                                     [(strip.end - strip.start) // 3 for strip in self.strips])
+
+    @property
+    def matrix_leds(self) -> Any:
+        """The LEDs of the strip, when the panels are all on one strip"""
+        return self.get_only_strip().leds
+
+    @matrix_leds.setter
+    def matrix_leds(self, leds: Any) -> None:
+        self.get_only_strip().leds = leds
+
+    def get_only_strip(self) -> LedStrip:
+        """Return the strip the panels are on, raising ValueError if they are on more than one"""
+        if len(self.strips) != 1:
+            raise ValueError(f'The panels are on {len(self.strips)} strips, use strips instead')
+        return self.strips[0]
+
+    def get_cell(self, color: bytes) -> terminal_renderer.Cell:
+        """Return the cell to show a light of the packed RGB color"""
+        try:
+            return self.cells[color]
+        except KeyError:
+            if len(self.cells) >= 4096:
+                # Lots of colors (eg from images) so don't keep them all
+                self.cells = {}
+            cell = self.cells[color] = (self.term.color_rgb(*color), '■')
+            return cell
+
+    def display_board(self, status: list[str]|None=None) -> None:
+        """Update the display of the board, with any status lines under it
+
+        Only the lights that changed since the last time are redrawn.
+        """
+        self.draw_board(self.lights.get_shown_bytes(), status)
+
+    def draw_board(self, shown: bytes, status: list[str]|None=None) -> None:
+        """Draw the shown colors of the lights (row by row packed RGB bytes), with any status lines under it"""
+        width = self.size.cols * 3
+        get_cell = self.get_cell
+        lines = [
+            [get_cell(shown[idx:idx + 3]) for idx in range(start, start + width, 3)]
+            for start in range(0, len(shown), width)
+        ]
+        lines.extend(self.renderer.text_line(text) for text in (status or []) + list(self.renderer.messages))
+        self.renderer.draw(lines)
 
     def display_leds(self) -> None:
         """Update the LED board"""
-        if not self.matrix_leds:
+        if not self.has_leds():
             raise ImportError('Cannot import the led control')
-        #
-        # There is an odd pattern to the for loops here
-        # because the LED numbers go in a line that zig zags
-        # across the matrix
-        idx = 0
-        for col in range(self.size.cols):
-            if col % 2 == 0:
-                row_range = range(self.size.rows)
-            else:
-                row_range = range(self.size.rows -1, -1, -1)
-            for row in row_range:
-                light = self.lights.get_light_at(COORD(row, col))
-                color = light.get_shown_color()
-                self.matrix_leds.set_led_color(idx, *color)
-                #
-                idx += 1
-        #
-        self.matrix_leds.update_strip()
+        self.send_leds(self.lights.export(self.led_order))
+
+    def send_leds(self, frame: bytes) -> None:
+        """Send a frame of packed RGB bytes, in the order of the LEDs, to the strips
+
+        The frame is only handed over as one buffer to drivers with set_frame,
+        see send_frame.
+        """
+        if self.output:
+            send_frame(self.output, frame)
+        elif len(self.strips) == 1:
+            send_frame(self.strips[0].leds, frame)
+        else:
+            for strip in self.strips:
+                if strip.leds:
+                    send_frame(strip.leds, frame[strip.start:strip.end])
+
+    def has_leds(self) -> bool:
+        """Return whether any of the strips have LEDs to control"""
+        return any(strip.leds for strip in self.strips)
+
+    def clear_leds(self) -> None:
+        """Turn off all the LEDs"""
+        if self.output:
+            try:
+                self.output.clear_strip()
+                self.output.update_strip()
+            finally:
+                self.output.close()
+            return
+        for strip in self.strips:
+            if strip.leds:
+                strip.leds.clear_strip()
+                strip.leds.update_strip()
 
     def update_board(self) -> None:
         """Update the board"""
-        for mode in self.modes:
-            mode.update(self.lights)
+        mode_profiler.profiler.update_modes(self.modes, self.lights)
+
+    def update_due_modes(self, scheduler: FrameScheduler, now: float) -> bool:
+        """Update the modes that are due, returning whether any were"""
+        due_modes = scheduler.get_due_modes(now)
+        mode_profiler.profiler.update_modes(due_modes, self.lights)
+        return bool(due_modes)
+
+class FrameOutput:
+    """Shows frames on another thread while the next one is rendered
+
+    The modes draw into the lights, which are the back buffer. At the end
+    of a frame show() takes a copy of them (the front buffer) and hands it
+    to the output thread, which sends it to the LEDs and draws it on the
+    screen while the modes get on with the next frame. If the last frame
+    is still being shown then show() waits for it first.
+    """
+
+    def __init__(self, matrix: DisplayMatrix, screen: bool, leds: bool) -> None:
+        """Initialise the output and start its thread"""
+        self.matrix = matrix
+        self.screen = screen
+        self.leds = leds
+        self.frames: queue.Queue[tuple[bytes|None, bytes|None, list[str]]|None] = queue.Queue(maxsize=1)
+        self.error: BaseException|None = None
+        self.thread = threading.Thread(target=self.run, name='frame-output', daemon=True)
+        self.thread.start()
+
+    def show(self, status: list[str]|None=None) -> None:
+        """Swap the frame the modes have drawn to the output"""
+        self.frames.join()
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+        lights = self.matrix.lights
+        self.frames.put((
+            lights.export(self.matrix.led_order) if self.leds else None,
+            lights.get_shown_bytes() if self.screen else None,
+            status or [],
+        ))
+
+    def run(self) -> None:
+        """Show the frames as they are handed over, until told to stop"""
+        while True:
+            frame = self.frames.get()
+            try:
+                if frame is None:
+                    return
+                leds, shown, status = frame
+                if leds is not None:
+                    self.matrix.send_leds(leds)
+                if shown is not None:
+                    self.matrix.draw_board(shown, status)
+            except Exception as err:
+                self.error = err
+            finally:
+                self.frames.task_done()
+
+    def close(self) -> None:
+        """Finish showing the last frame and stop the thread, raising the error if showing it failed"""
+        self.frames.join()
+        self.frames.put(None)
+        self.thread.join()
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+
 
 @click.command()
 @click.option('--screen', default=False, type=bool, is_flag=True, help="Whether to show the simulation on the screen")
 @click.option('--leds', default=False, type=bool, is_flag=True, help="Whether to try to control the LED matrix")
 @click.option('--interval', default=10, type=float, help="Refresh interval (s)")
 @click.option('--config', required=True, type=str, help="File to use for config")
+@click.option('--parallel-output/--serial-output', default=True,
+              help="Whether to send to the LEDs from other threads while the next frame is worked out")
+@click.option('--wiring', default=Wiring.COLUMN_SERPENTINE.value, type=click.Choice([w.value for w in Wiring]),
+              help="How the LEDs are wired through the matrix")
+@click.option('--stats-file', default="stats/matrix_display.json", type=click.Path(),
+              help="File to save the startup and tick timings to, empty for none")
+@click.option('--profile-modes', default=False, is_flag=True,
+              help="Time the updates of each mode, SIGUSR1 then saves a profile to the stats folder")
 @click.argument('parameters', nargs=-1)
-def main(screen: bool, leds: bool, interval: float, config: str, parameters: list[str]) -> None:
-    def signal_handler(sig: int, frame: FrameType|None) -> None:
-        """Handle the SIGTERM from SystemD"""
-        print(f'Caught SIGTERM {sig}')
-        if b.matrix_leds:
-            print('Clearing strip')
-            b.matrix_leds.clear_strip()
-            b.matrix_leds.update_strip()
-        sys.exit(0)
-
-    signal.signal(signal.SIGTERM, signal_handler)
-
-    b = DisplayMatrix(GRID(16, 16), [])
+def main(screen: bool, leds: bool, interval: float, config: str, parallel_output: bool, wiring: str, stats_file: str,
+         profile_modes: bool, parameters: list[str]) -> None:
+    timeline = startup_timeline.Timeline('matrix_display', pathlib.Path(stats_file) if stats_file else None)
+    timeline.mark('imports')
+    if profile_modes:
+        mode_profiler.profiler.enable('matrix_display')
 
     config_module = importlib.import_module(config)
+    if hasattr(config_module, 'get_layout'):
+        size, panels = config_module.get_layout()
+    else:
+        size, panels = GRID(16, 16), None
+    timeline.mark('config')
+
+    b = DisplayMatrix(size, [], Wiring(wiring), panels, parallel_output and leds)
+    timeline.mark('lights')
     modes = config_module.get_modes(b, *parameters)
     for mode in modes:
         b.modes.append(mode)
+    timeline.mark('face')
+
+    scheduler = FrameScheduler(b.modes, interval)
+    output = FrameOutput(b, screen, leds and b.has_leds())
+    # Frames are only slow if they take a good part of the time until the next one
+    timeline.slow_tick = min((mode.update_interval or interval for mode in b.modes), default=interval) / 2
+    if screen:
+        # Printing would upset the renderer, so the timeline's lines are shown under the board
+        timeline.write_log = b.renderer.log
+
+    def signal_handler(sig: int, frame: FrameType|None) -> None:
+        """Handle the SIGTERM from SystemD by stopping as if CTRL-C was pressed"""
+        print(f'Caught SIGTERM {sig}')
+        raise KeyboardInterrupt
 
+    # Only once everything is set up, so stopping always goes through the clean up below
+    signal.signal(signal.SIGTERM, signal_handler)
     try:
         while True:
-            b.update_board()
-            if screen:
-                b.display_board()
-            if leds and b.matrix_leds:
-                b.display_leds()
-            time.sleep(interval)
+            start = time.perf_counter()
+            if b.update_due_modes(scheduler, time.monotonic()):
+                output.show([f'Dropped frames: {scheduler.dropped_frames}'])
+                timeline.add_tick(time.perf_counter() - start)
+            time.sleep(max(0.0, scheduler.get_next_due_time(time.monotonic()) - time.monotonic()))
     except KeyboardInterrupt:
         pass
-    #
-    if b.matrix_leds:
-        print('Clearing strip')
-        b.matrix_leds.clear_strip()
-        b.matrix_leds.update_strip()
+    finally:
+        # Already stopping, so don't let another SIGTERM cut the clean up short
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        try:
+            output.close()
+        finally:
+            print(f'Dropped frames: {scheduler.dropped_frames}')
+            timeline.save()
+            #
+            if b.has_leds():
+                print('Clearing strip')
+                b.clear_leds()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,23 @@
 """Modes that control lights on the matrix"""
+import bisect
 import colorsys
+import hashlib
+import itertools
+import json
 import random
 import time
 import os
 import pathlib
+from operator import itemgetter
 import PIL.Image
 from matrix_common import *
 
+# NumPy is only needed for the vectorized sand simulation (the sand dependency group)
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore[assignment]
+
 
 class ModeUpdateError(Exception):
     """An error occurred while updating the mode"""
@@ -15,6 +26,8 @@ class ModeUpdateError(Exception):
 class Mode:
     """An abstract mode that drives the matrix display"""
 
+    update_interval: float|None = None  # s between updates, None to use the display interval
+
     def __init__(self, locations: list[COORD]) -> None:
         """Initialise the mode"""
         self.light_locations = locations
@@ -22,16 +35,22 @@ class Mode:
     def update(self, lights: LightCollection) -> None:
         """Update the board according to the mode"""
 
+    def get_next_update_time(self, due: float, interval: float) -> float:
+        """Return when the update after the one due at this time should happen"""
+        return due + (self.update_interval or interval)
+
 
 
 class CycleColors(Mode):
     """A mode that cycles colors"""
 
-    def __init__(self, locations: list[COORD], colors: list[COLOR], synchronized: bool=False) -> None:
-        """Initialise the mode"""
+    def __init__(self, locations: list[COORD], colors: list[COLOR], synchronized: bool=False,
+                 update_interval: float|None=1.0) -> None:
+        """Initialise the mode, cycling once a second unless told otherwise"""
         super().__init__(locations)
         self.color_list = colors
         self.synchronized = synchronized
+        self.update_interval = update_interval
 
     def update(self, lights: LightCollection) -> None:
         """Update all the colors"""
@@ -50,51 +69,143 @@ class CycleColors(Mode):
 
 
 class ShowImage(Mode):
-    """A mode that shows one or more images in sequence"""
+    """A mode that shows one or more images in sequence
+
+    Every frame is decoded once, up front, into packed RGB bytes in the order
+    of the light locations, so showing a frame is a single copy into the
+    lights. Frames are shown for as long as the image says, so animations
+    play at their own rate whatever the update interval is. If a cache folder
+    is given then the decoded frames are kept there for next time.
+    """
 
-    def __init__(self, locations: list[COORD], file: pathlib.Path, size: GRID) -> None:
+    default_frame_duration = 100  # ms, as used by browsers when a GIF doesn't say
+
+    def __init__(self, locations: list[COORD], file: pathlib.Path, size: GRID,
+                 cache_folder: pathlib.Path|None=None) -> None:
         """Initialise the mode"""
         super().__init__(locations)
-        self.original_image = PIL.Image.open(file)
-        self.frames: list[PIL.Image.Image] = []
         self.size = size
+        self.frames: list[bytes] = []
+        self.frame_durations: list[int] = []
+        self.start_time: float|None = None
         #
-        # Extract all the frames if there are some
-        if self.original_image.n_frames > 0:  # type: ignore
-            for idx in range(self.original_image.n_frames):  # type: ignore
-                self.original_image.seek(idx)
-                self.frames.append(self.get_frame_from(self.original_image))
-        else:
-            self.frames.append(self.original_image)
+        cache_file = self.get_cache_file(file, cache_folder) if cache_folder else None
+        if not (cache_file and self.load_frames(cache_file)):
+            self.decode_frames(file)
+            if cache_file:
+                self.save_frames(cache_file)
+        self.frame_ends = list(itertools.accumulate(self.frame_durations))
+
+    def decode_frames(self, file: pathlib.Path) -> None:
+        """Extract all the frames from the image"""
+        with PIL.Image.open(file) as image:
+            for idx in range(getattr(image, 'n_frames', 1)):
+                image.seek(idx)
+                duration = image.info.get('duration') or 0
+                self.frames.append(self.get_frame_data(self.get_frame_from(image)))
+                self.frame_durations.append(int(duration) if duration > 10 else self.default_frame_duration)
 
     def get_frame_from(self, image: PIL.Image.Image) -> PIL.Image.Image:
         """Return a scaled and converted frame"""
         frame = image.convert('RGB')
-        frame = frame.resize(self.size)
+        frame = frame.resize((self.size.cols, self.size.rows))
         return frame
 
+    def get_frame_data(self, frame: PIL.Image.Image) -> bytes:
+        """Return the colors of the frame at the light locations as packed RGB bytes"""
+        if not self.light_locations:
+            return b''
+        picks = [(location.row * self.size.cols + location.col) * 3 + part
+                 for location in self.light_locations for part in range(3)]
+        return bytes(itemgetter(*picks)(frame.tobytes()))
+
+    def get_cache_file(self, file: pathlib.Path, cache_folder: pathlib.Path) -> pathlib.Path:
+        """Return the file the decoded frames are cached in"""
+        key = hashlib.sha256(pathlib.Path(file).read_bytes())
+        key.update(repr((tuple(self.size), [tuple(location) for location in self.light_locations])).encode('utf-8'))
+        return cache_folder / f'{key.hexdigest()}.frames'
+
+    def load_frames(self, cache_file: pathlib.Path) -> bool:
+        """Load the decoded frames from the cache, returning False if they are not there or not usable
+
+        A cache that is cut short or was written by an older version counts
+        as not being there, so the frames are decoded again and it is replaced.
+        """
+        try:
+            with open(cache_file, 'rb') as f:
+                header = json.loads(f.readline())
+                data = f.read()
+            frame_size = header['frame-size']
+            durations = [int(duration) for duration in header['durations']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if frame_size != len(self.light_locations) * 3 or not durations or len(data) != frame_size * len(durations):
+            return False
+        self.frame_durations = durations
+        self.frames = [data[idx * frame_size:(idx + 1) * frame_size] for idx in range(len(durations))]
+        return True
+
+    def save_frames(self, cache_file: pathlib.Path) -> None:
+        """Save the decoded frames to the cache"""
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            f.write(json.dumps({
+                'frame-size': len(self.frames[0]),
+                'durations': self.frame_durations,
+            }).encode('utf-8') + b'\n')
+            f.write(b''.join(self.frames))
+
+    def get_frame_position(self, now: float) -> tuple[int, float]:
+        """Return the index of the frame to show at this time and how long until it ends (s)
+
+        Times within half a millisecond of the end of a frame count as the
+        next frame so rounding doesn't show a frame twice.
+        """
+        if self.start_time is None:
+            self.start_time = now
+        elapsed = ((now - self.start_time) * 1000) % self.frame_ends[-1]
+        idx = bisect.bisect_right(self.frame_ends, elapsed + 0.5)
+        if idx == len(self.frame_ends):
+            return 0, (self.frame_ends[-1] + self.frame_ends[0] - elapsed) / 1000
+        return idx, (self.frame_ends[idx] - elapsed) / 1000
+
+    def get_frame_index(self, now: float) -> int:
+        """Return the index of the frame to show at this time"""
+        return self.get_frame_position(now)[0]
+
+    def get_next_update_time(self, due: float, interval: float) -> float:
+        """Return when the update after the one due at this time should happen
+
+        Animations are next due when the frame changes.
+        """
+        if len(self.frames) == 1 or self.update_interval:
+            return super().get_next_update_time(due, interval)
+        return due + self.get_frame_position(due)[1]
+
     def update(self, lights: LightCollection) -> None:
         """Update the representation of the picture"""
-        #
-        # Get the frame to display
-        frame = self.frames.pop(0)
-        self.frames.append(frame)
-        #
-        # Now light up the display pixels
-        for location in self.light_locations:
-            light = lights.get_light_at(location)
-            pixel_color: COLOR = frame.getpixel((location.col, location.row))  # type: ignore
-            light.set_color(pixel_color)
+        frame = self.frames[self.get_frame_index(time.monotonic())]
+        lights.set_colors(self.light_locations, frame)
 
 
 class SandSim(Mode):
-    """A mode that runs a sand falling simulation"""
+    """A mode that runs a sand falling simulation
+
+    The vectorized engine needs NumPy, from the sand dependency group.
+    """
 
     def __init__(self, locations: list[COORD], size: GRID, colors: dict[int, COLOR],
                  drop_interval: int=5, drop_count: int=1, max_sim_length: int=200,
-                 random_at_end: bool=False) -> None:
+                 random_at_end: bool=False, vectorized: bool=False, update_interval: float|None=0.05) -> None:
+        """Initialise the mode, running at 20 steps a second unless told otherwise"""
         super().__init__(locations)
-        self.sim = SandSimulation(size.cols, size.rows)
+        self.update_interval = update_interval
+        if vectorized:
+            if numpy is None:
+                raise ImportError('Cannot import numpy for the vectorized sand simulation')
+            self.sim: SandSimulation = VectorSandSimulation(size.cols, size.rows)
+        else:
+            self.sim = SandSimulation(size.cols, size.rows)
         self.iteration = 0
         self.colors = colors
         self.drop_interval = self.initial_drop_interval = drop_interval
@@ -286,3 +397,63 @@ class SandSimulation:
             print("\nSimulation stopped by user.")
 
 
+class VectorSandSimulation(SandSimulation):
+    """A sand simulation that uses NumPy to move a whole row of sand at once"""
+
+    def __init__(self, width: int=16, height: int=16) -> None:
+        """
+        Initializes the sand simulation grid.
+
+        Args:
+            width (int): The width of the simulation grid.
+            height (int): The height of the simulation grid.
+        """
+        self.rng = numpy.random.default_rng()
+        super().__init__(width, height)
+
+    def init_grid(self) -> None:
+        """Initialise the grid"""
+        self.grid = numpy.zeros((self.height, self.width), dtype=numpy.uint8)  # type: ignore[assignment]
+
+    def _update_sand(self) -> None:
+        """
+        Applies the falling logic to all sand particles in the grid.
+        Moves all the grains at once using shifted masks of the grid rather
+        than visiting each cell, and draws the random numbers for the whole
+        step in one go.
+        """
+        grid: numpy.ndarray = self.grid  # type: ignore[assignment]
+        shape = grid.shape
+        #
+        # A grain falls if there is a space anywhere below it in its column, since
+        # the grains underneath it fall too
+        empty = grid == 0
+        space_below = numpy.zeros(shape, dtype=bool)
+        space_below[:-1] = numpy.logical_or.accumulate(empty[:0:-1], axis=0)[::-1]
+        falling = ~empty & space_below
+        moved = grid[:-1][falling[:-1]]
+        grid[falling] = 0
+        grid[1:][falling[:-1]] = moved
+        #
+        # Some of the grains that did not fall cascade diagonally
+        landed = numpy.zeros(shape, dtype=bool)
+        landed[1:] = falling[:-1]
+        cascading = (grid != 0) & ~landed & (self.rng.random(shape) < self.probability_of_cascading)
+        cascading[-1] = False
+        empty = grid == 0
+        can_fall_left = numpy.zeros(shape, dtype=bool)
+        can_fall_left[:-1, 1:] = cascading[:-1, 1:] & empty[1:, :-1]
+        can_fall_right = numpy.zeros(shape, dtype=bool)
+        can_fall_right[:-1, :-1] = cascading[:-1, :-1] & empty[1:, 1:]
+        go_left = can_fall_left & (~can_fall_right | (self.rng.random(shape) < 0.5))
+        rows, cols = numpy.nonzero(go_left)
+        grid[rows + 1, cols - 1] = grid[rows, cols]
+        grid[rows, cols] = 0
+        #
+        # Check again for space on the right as a grain may have just cascaded there
+        empty = grid == 0
+        go_right = can_fall_right & ~go_left
+        go_right[:-1, :-1] &= empty[1:, 1:]
+        rows, cols = numpy.nonzero(go_right)
+        grid[rows + 1, cols + 1] = grid[rows, cols]
+        grid[rows, cols] = 0
@@ -1,6 +1,8 @@
 """Mock interface for lights to allow testing"""
 
 import time
+from collections.abc import Callable
+
 import blessed
 
 
@@ -20,9 +22,11 @@ class MockLEDColor:
 
 class MockLights:
 
-    def __init__(self, spi_device: blessed.Terminal, num_leds: int, spi_speed_khz: int=800) -> None:
+    def __init__(self, spi_device: blessed.Terminal, num_leds: int, spi_speed_khz: int=800,
+                 log: Callable[[str], None]|None=None) -> None:
         self.spi_device = spi_device
         self.num_leds = num_leds
+        self.log = log
         self.temp_state = [MockLEDColor()] * num_leds
         self.led_state: list[MockLEDColor] = []
 
@@ -41,10 +45,63 @@ class MockLights:
 
     def update_strip(self, sleep_duration: float=0.1) -> None:
         self.led_state = self.temp_state[:]
-        print(self.spi_device.green('Lights on: '), end='')
-        for idx, color in enumerate(self.led_state):
-            if self.led_state[idx].is_set():
-                print(self.spi_device.green(str(idx)), end=' ')
-        print()
+        lights_on = ' '.join(str(idx) for idx, color in enumerate(self.led_state) if color.is_set())
+        if self.log:
+            self.log(f'Lights on: {lights_on}')
+        else:
+            print(self.spi_device.green(f'Lights on: {lights_on}'))
         time.sleep(sleep_duration)
 
+
+class FastMockLights:
+    """Mock lights that keep the strip in memory without printing or sleeping
+
+    The strip is held as packed RGB bytes and each update counts what would
+    have been sent to the strip, so it can be used for fast simulations,
+    benchmarks and tests.
+    """
+
+    def __init__(self, spi_device: blessed.Terminal|None, num_leds: int, spi_speed_khz: int=800,
+                 keep_frames: bool=False) -> None:
+        self.spi_device = spi_device
+        self.num_leds = num_leds
+        self.strip = bytearray(num_leds * 3)
+        self.led_state = bytes(self.strip)
+        self.updates = 0
+        self.bytes_sent = 0
+        self.keep_frames = keep_frames
+        self.frames: list[bytes] = []
+
+    def clear_strip(self) -> None:
+        self.fill_strip(0, 0, 0)
+
+    def fill_strip(self, red: int=0, green: int=0, blue: int=0) -> None:
+        self.strip[:] = bytes((red, green, blue)) * self.num_leds
+
+    def set_led_color(self, index: int, red: int, green: int, blue: int) -> bool:
+        if 0 <= index < self.num_leds:
+            self.strip[index * 3:index * 3 + 3] = bytes((red, green, blue))
+            return True
+        return False
+
+    def set_frame(self, data: bytes) -> None:
+        """Set every LED from packed RGB bytes in strip order"""
+        if len(data) != len(self.strip):
+            raise ValueError(f'Frame has {len(data)} bytes but the strip needs {len(self.strip)}')
+        self.strip[:] = data
+
+    def update_strip(self, sleep_duration: float=0.1) -> None:
+        self.led_state = bytes(self.strip)
+        self.updates += 1
+        self.bytes_sent += len(self.led_state)
+        if self.keep_frames:
+            self.frames.append(self.led_state)
+
+    def snapshot(self) -> bytes:
+        """Return the colors last sent to the strip as packed RGB bytes"""
+        return self.led_state
+
+    def get_led_color(self, index: int) -> tuple[int, int, int]:
+        """Return the color last sent to an LED"""
+        red, green, blue = self.led_state[index * 3:index * 3 + 3]
+        return red, green, blue
@@ -0,0 +1,154 @@
+"""Timing how long each mode takes to update
+
+This is off unless enabled, when all it costs is one check per tick. When
+enabled, every update of a mode (one tick in every sample_every) is timed
+and kept in a rolling histogram for that mode. Sending the process SIGUSR1
+then runs cProfile over the next ticks, writes the profile to a .prof
+file (which snakeviz, flameprof and gprof2dot can read) and logs the
+histograms.
+"""
+import bisect
+import collections
+import cProfile
+import datetime
+import pathlib
+import signal
+import statistics
+import sys
+import time
+from collections.abc import Iterable
+from typing import Any, TextIO
+
+
+# Upper bounds (us) of the histogram buckets, the last bucket is everything slower
+BUCKETS = [2 ** power for power in range(4, 21)]
+
+
+class RollingHistogram:
+    """The most recent update times of a mode"""
+
+    def __init__(self, size: int=1000) -> None:
+        """Initialise the histogram"""
+        self.samples: collections.deque[float] = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """Add the time of an update"""
+        self.samples.append(seconds)
+        self.count += 1
+
+    def get_buckets(self) -> list[int]:
+        """Return how many of the recent updates fall in each bucket"""
+        counts = [0] * (len(BUCKETS) + 1)
+        for seconds in self.samples:
+            counts[bisect.bisect_left(BUCKETS, seconds * 1_000_000)] += 1
+        return counts
+
+    def get_summary(self) -> dict[str, float]:
+        """Return the statistics of the recent updates in us"""
+        samples = [seconds * 1_000_000 for seconds in self.samples]
+        if len(samples) < 2:
+            return {'count': self.count, 'max': max(samples, default=0.0)}
+        percentiles = statistics.quantiles(samples, n=100, method='inclusive')
+        return {
+            'count': self.count,
+            'p50': percentiles[49],
+            'p90': percentiles[89],
+            'p99': percentiles[98],
+            'max': max(samples),
+        }
+
+
+class ModeProfiler:
+    """Times the updates of the modes"""
+
+    def __init__(self, name: str='clock', enabled: bool=False, sample_every: int=1, profile_ticks: int=100,
+                 profile_folder: pathlib.Path=pathlib.Path('stats'), out: TextIO|None=None) -> None:
+        """Initialise the profiler"""
+        self.name = name
+        self.enabled = enabled
+        self.sample_every = sample_every
+        self.profile_ticks = profile_ticks
+        self.profile_folder = profile_folder
+        self.out = out or sys.stderr
+        self.histograms: dict[str, RollingHistogram] = {}
+        self.ticks = 0
+        self.profile: cProfile.Profile|None = None
+        self.profile_requested = False
+        self.profiled_ticks = 0
+
+    def enable(self, name: str, sample_every: int=1, install_signal: bool=True) -> None:
+        """Start timing the modes, with SIGUSR1 asking for a profile"""
+        self.name = name
+        self.sample_every = sample_every
+        self.enabled = True
+        if install_signal and hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.request_profile)
+
+    def request_profile(self, sig: int|None=None, frame: Any=None) -> None:
+        """Ask for the next ticks to be profiled, safe to call from a signal handler"""
+        self.profile_requested = True
+
+    def update_modes(self, modes: Iterable[Any], target: Any) -> list[Any]:
+        """Update each of the modes, returning what they returned"""
+        if not self.enabled:
+            return [mode.update(target) for mode in modes]
+        #
+        self.ticks += 1
+        if self.profile_requested and self.profile is None:
+            self.profile_requested = False
+            self.profile = cProfile.Profile()
+            self.profiled_ticks = 0
+        if self.profile:
+            self.profile.enable()
+        try:
+            if self.ticks % self.sample_every:
+                return [mode.update(target) for mode in modes]
+            results = []
+            for mode in modes:
+                start = time.perf_counter()
+                results.append(mode.update(target))
+                elapsed = time.perf_counter() - start
+                label = type(mode).__name__
+                if label not in self.histograms:
+                    self.histograms[label] = RollingHistogram()
+                self.histograms[label].add(elapsed)
+            return results
+        finally:
+            if self.profile:
+                self.profile.disable()
+                self.profiled_ticks += 1
+                if self.profiled_ticks >= self.profile_ticks:
+                    self.dump_profile()
+
+    def get_report(self) -> list[str]:
+        """Return lines describing the time each mode takes to update"""
+        lines = [f'{"mode":<24} {"updates":>8} {"p50 us":>9} {"p90 us":>9} {"p99 us":>9} {"max us":>9}']
+        for label, histogram in sorted(self.histograms.items()):
+            summary = histogram.get_summary()
+            lines.append(f'{label:<24} {summary["count"]:>8} {summary.get("p50", 0):>9.1f} '
+                         f'{summary.get("p90", 0):>9.1f} {summary.get("p99", 0):>9.1f} {summary["max"]:>9.1f}')
+            buckets = histogram.get_buckets()
+            bounds = [f'<{bound}' for bound in BUCKETS] + [f'>={BUCKETS[-1]}']
+            lines.append('    ' + ' '.join(f'{bound}:{count}' for bound, count in zip(bounds, buckets) if count))
+        return lines
+
+    def dump_profile(self) -> pathlib.Path|None:
+        """Save the profile that has been running and log the histograms, returning the profile file"""
+        profile, self.profile = self.profile, None
+        if profile is None:
+            return None
+        when = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        filename = self.profile_folder / f'{self.name}-{when}.prof'
+        try:
+            self.profile_folder.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(filename)
+        except OSError as err:
+            print(f'Could not save profile to {filename}: {err}', file=self.out)
+            return None
+        print(f'Profiled {self.profiled_ticks} ticks to {filename}', file=self.out)
+        print('\n'.join(self.get_report()), file=self.out, flush=True)
+        return filename
+
+
+profiler = ModeProfiler()
@@ -4,11 +4,13 @@ from __future__ import annotations
 import datetime
 import enum
 import json
-import os
 import subprocess
+import threading
 from collections import namedtuple
 from typing import Any, TYPE_CHECKING
 
+import file_watcher
+
 if TYPE_CHECKING:
     from run_clock import Board
 
@@ -20,9 +22,10 @@ class FaceModeType(enum.Enum):
     TEST = 3
 
 
-# Get IP Address
-result = subprocess.run(['./scripts/getip.sh'], capture_output=True)
-IP_ADDRESS = result.stdout.decode('utf-8').strip()
+def get_ip_address() -> str:
+    """Return the current IP address"""
+    result = subprocess.run(['./scripts/getip.sh'], capture_output=True)
+    return result.stdout.decode('utf-8').strip()
 
 
 class Mode:
@@ -38,6 +41,14 @@ class Mode:
         """Update the board according to the mode"""
         return []
 
+    def get_update_delay(self, board: Board, interval: float) -> float|None:
+        """Return how long (s) until the mode needs to update the board again, or None if it doesn't"""
+        return interval
+
+    def get_watched_files(self) -> list[str]:
+        """Return the files which give the mode new data when they change"""
+        return []
+
     def set_edge_light_by_index(self, board: Board, index: int, color: tuple[int, int, int]|None=None) -> None:
         if index < 16:
             row, col = 0, index
@@ -55,17 +66,21 @@ class Normal(Mode):
 
     def update(self, board: Board) -> list[str]:
         """Update the board to show the current time"""
-        time_string = board.convert_time()
-        time_words = time_string.split()
-        possible_words = board.get_all_words()
-        for word in time_words:
-            the_word = board.find_next_word(word, possible_words)
-            the_word.activate()
+        board.activate_text(board.convert_time())
         return []
 
+    def get_update_delay(self, board: Board, interval: float) -> float|None:
+        """The words only change when the time moves on to a new phrase"""
+        return board.get_seconds_until_text_changes()
+
 
 class ShowIPAddress(Mode):
-    """Show the current IP address by flashing the numbers one by one"""
+    """Show the current IP address by flashing the numbers one by one
+
+    Looking up the address runs a script, so unless it is given one the
+    mode looks it up on a thread the first time it is shown, rather than
+    holding up the clock.
+    """
 
     words = [
         'zero', 'one', 'two', 'three', 'four', 'five',
@@ -77,7 +92,8 @@ class ShowIPAddress(Mode):
         """Initialise the mode"""
         super().__init__(parameters)
         self.character_idx = -1
-        self.ip_address = IP_ADDRESS
+        self.ip_address: str|None = None      # Looked up when first shown
+        self.lookup: threading.Thread|None = None
         self.edge_mode = ConfigMode(None)
         self.edge_mode.color = (100, 100, 255)
 
@@ -85,17 +101,21 @@ class ShowIPAddress(Mode):
         """Update the board to show the IP address"""
         #
         # Get the index of the next character to display
+        if self.ip_address is None:
+            if self.lookup is None:
+                self.lookup = threading.Thread(target=self.look_up_ip_address, daemon=True)
+                self.lookup.start()
+            # Keep showing the start until the address is known
+            board.activate_text('IT IS')
+            self.edge_mode.update(board)
+            return []
         stripped_ip = self.ip_address.replace('.', '..') + '..'
         if self.character_idx >= len(stripped_ip):
             self.character_idx = -1
         #
-        # Find all words in the face
-        possible_words = board.get_all_words()
-        #
         if self.character_idx == -1:
             # Start of the IP address
-            board.find_next_word('IT', possible_words).activate()
-            board.find_next_word('IS', possible_words).activate()
+            board.activate_text('IT IS')
         else:
             # Showing the IP address
             current_character = stripped_ip[self.character_idx]
@@ -104,14 +124,17 @@ class ShowIPAddress(Mode):
             else:
                 word = 'dot'
              #
-            the_word = board.find_next_word(word, possible_words)
-            the_word.activate()
+            board.activate_text(word)
              #
         self.character_idx += 1
         self.edge_mode.update(board)
         #
         return []
 
+    def look_up_ip_address(self) -> None:
+        """Find out the IP address"""
+        self.ip_address = get_ip_address()
+
 
 class EdgeLightSeconds(Mode):
     """Show the number of seconds using the edge light"""
@@ -126,6 +149,10 @@ class EdgeLightSeconds(Mode):
         self.set_edge_light_by_index(board, s, (255, 255, 255))
         return []
 
+    def get_update_delay(self, board: Board, interval: float) -> float|None:
+        """Update on the next second"""
+        return 1 - datetime.datetime.now().microsecond / 1_000_000
+
 
 class EdgeLightColor(Mode):
     """Set the edge lights to be red, white and blue"""
@@ -151,6 +178,10 @@ class EdgeLightColor(Mode):
         self.offset += 1
         return []
 
+    def get_update_delay(self, board: Board, interval: float) -> float|None:
+        """The colors only move if there is more than one"""
+        return interval if len(self.colors) > 1 else None
+
 
 class EdgeLightBlank(EdgeLightColor):
     """No lights on the edge"""
@@ -211,6 +242,10 @@ class TestEdge(Mode):
             self.on = not self.on
         return []
 
+    def get_update_delay(self, board: Board, interval: float) -> float|None:
+        """Only need to update if flashing"""
+        return interval if self.toggle else None
+
     def set_edges(self, top: bool, right: bool, bottom: bool, left: bool) -> None:
         """Set all edges at once"""
         self.top = top
@@ -220,13 +255,11 @@ class TestEdge(Mode):
 
     def cycle_edges(self) -> None:
         """Cycle the edges around"""
-        print('Cycling edges', self.top, self.right, self.bottom, self.left)
         left = self.left
         self.left = self.bottom
         self.bottom = self.right
         self.right = self.top
         self.top = left
-        print('After Cycling edges', self.top, self.right, self.bottom, self.left)
 
     def set_edges_from_int(self, value: int) -> None:
         """Set the edges base on the value"""
@@ -291,37 +324,44 @@ class EdgeLightCustom(Mode):
     type = FaceModeType.EDGE
     include_as_dynamic = True
 
+    config_file = 'config/local_config.json'
+    data_file = 'config/local_data.json'
+
     def __init__(self, parameters: list[str]|None) -> None:
         super().__init__(parameters)
         #
         self.config_data = self.read_config()
         self.frequency = self.config_data['frequency']
-        self.last_time = 0.0
+        self.data_version: int|None = None
         self.last_data = None
 
     def read_config(self) -> Any:
         """Read the configuration data"""
-        with open('config/local_config.json', 'r') as f:
-            config_data_text = f.read()
-        return json.loads(config_data_text)
+        return file_watcher.watcher.get_json(self.config_file)
 
     def get_data(self) -> Any:
         """Get the latest data to show"""
         #
-        last_update = os.stat('config/local_data.json').st_mtime
-        if self.last_time is None or last_update > self.last_time:
-            with open('config/local_data.json', 'r') as f:
-                data_text = f.read()
+        version = file_watcher.watcher.get_version(self.data_file)
+        if version != self.data_version:
             try:
-                data = json.loads(data_text)
+                data = file_watcher.watcher.get_json(self.data_file)
             except json.decoder.JSONDecodeError:
                 # Oops, something went wrong
                 data = None
-            self.last_time = last_update
+            self.data_version = version
             return data
         else:
             return None
 
+    def get_update_delay(self, board: Board, interval: float) -> float|None:
+        """Only need to update when the data changes"""
+        return None
+
+    def get_watched_files(self) -> list[str]:
+        """Return the files which give the mode new data when they change"""
+        return [self.config_file, self.data_file]
+
     def update(self, board: Board) -> list[str]:
         """Update the display"""
         data = self.get_data()
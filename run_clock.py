@@ -1,24 +1,32 @@
+import copy
 import enum
 import json
+import os
 import pathlib
 import random
+import re
+import shlex
 import signal
+import subprocess
 import sys
 import datetime
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
 from types import FrameType
 from typing import Any
-import json
 
 import blessed
 import blessed.sequences
 import timesayer
 import click
 import mocklights
+import led_strips
 import faces
+import terminal_renderer
 import modes
 import clock_updater
-import mocklights
+import frame_recording
+import mode_profiler
+import startup_timeline
 
 
 RUN_MODES = ['NORMAL', 'CALCSIZE', 'SHOWLETTERS']
@@ -31,7 +39,8 @@ class Board:
                  light_color: tuple[int, int, int]|None=None,
                  replace_blanks: bool=False, blank_character: str=' ', edge_character: str=' ',
                  show_a: bool=False, display: list[modes.Mode]|None=None,
-                 record_frames_to: pathlib.Path|None=None, month_mode: bool=False):
+                 record_frames_to: pathlib.Path|None=None, month_mode: bool=False,
+                 record_compress: bool=False):
         self.term = term
         self.time = time
         self.rows: list[list[faces.Word]] = [[]]
@@ -46,9 +55,22 @@ class Board:
         self.replace_blanks = replace_blanks
         self.show_a = show_a
         self.edge_lights: dict[tuple[int, int], tuple[int, int, int]] = {}
+        self.led_index: tuple[int, ...] = ()
+        self.edge_led_index: dict[tuple[int, int], int] = {}
+        self.led_frame: list[tuple[int, int, int]] = []
+        self.sent_frame: list[tuple[int, int, int]]|None = None
+        self.all_words: tuple[faces.Word, ...] = ()
+        self.dimensions: tuple[int, int]|None = None
+        self.word_spans: list[list[tuple[faces.Word, int, int]]] = []
+        self.row_fills: list[str] = []
+        self.text_templates: list[str] = []
+        self.activation_plans: dict[str, tuple[int, ...]] = {}
         self.modes = display or [modes.Normal(None)]
         self.show_board_on_terminal = True
+        self.renderer = terminal_renderer.TerminalRenderer(term)
         self.record_frames_to = record_frames_to
+        self.record_compress = record_compress
+        self.recorder: frame_recording.FrameRecorder|None = None
         self.recorded_frames = 0
         self.recorded_mode_button: bool = False
         self.recorded_action_button: bool = False
@@ -61,6 +83,7 @@ class Board:
             self.rows[word.line].append(word)
 
     def add_words(self, words: faces.FaceDefinition) -> None:
+        old_total_lights = self.total_lights
         current_line = 0
         for word in words:
             if word.new_line:
@@ -70,10 +93,87 @@ class Board:
                 word.line = current_line
                 self.add_word(word)
 
-        cols, rows = self.get_dimensions()
+        self.dimensions = None
+        self.dimensions = cols, rows = self.get_dimensions()
         self.total_lights = cols * rows
-        if self.lights_fn:
+        self.build_layout(cols)
+        self.build_led_map(cols, rows)
+        self.all_words = tuple(self.get_all_words())
+        self.activation_plans = {}
+        if self.lights_fn and (self.lights is None or self.total_lights != old_total_lights):
+            self.close_lights()
             self.lights = self.lights_fn(self.total_lights)
+            if isinstance(self.lights, mocklights.MockLights):
+                # Printing would upset the renderer so show what the lights are doing in the logs
+                self.lights.log = self.renderer.log
+
+    def close_lights(self) -> None:
+        """Let go of the LED strip so its device can be opened again"""
+        lights, self.lights = self.lights, None
+        if lights is not None:
+            led_strips.close_strip(lights)
+
+    def set_face(self, face_mode: str) -> None:
+        """Change to showing a different face"""
+        self.rows = [[]]
+        self.simple = face_mode == '14x5'
+        self.add_words(copy.deepcopy(faces.faces[face_mode]))
+        self.renderer.reset()
+        self.stop_recording()
+
+    def apply_settings(self, settings: dict[str, Any], changed: set[str]) -> None:
+        """Apply the changed settings from the command line options"""
+        if 'face_mode' in changed:
+            self.set_face(settings['face_mode'])
+        if 'light_color' in changed:
+            self.light_color = hex_to_rgb(settings['light_color']) or (255, 255, 255)
+        if 'show_it_is' in changed:
+            self.show_it_is = settings['show_it_is']
+        if 'show_a' in changed:
+            self.show_a = settings['show_a']
+
+    def build_layout(self, cols: int) -> None:
+        """Work out where each word sits in its row and the text of the rows with no words lit
+
+        The fill characters at the end of each row are chosen once here so that
+        rendering a row only has to splice in the words that are lit.
+        """
+        self.word_spans = []
+        self.row_fills = []
+        self.text_templates = []
+        for row in self.rows:
+            spans = []
+            position = 0
+            for word in row:
+                spans.append((word, position, position + len(word.word)))
+                position += len(word.word)
+            self.word_spans.append(spans)
+            self.row_fills.append(self.get_fill_character(cols - position))
+            self.text_templates.append(' ' * position + self.row_fills[-1])
+
+    def build_led_map(self, cols: int, rows: int) -> None:
+        """Work out which LED each letter of the board is wired to
+
+        Lights go down from 0 in the top left and then at the end of each column they
+        bounce back up. The map is indexed by the position of the letter in the board
+        text (row by row) and the edge map only holds the letters on the outer edge.
+        """
+        led_index = [0] * (cols * rows)
+        self.edge_led_index = {}
+        idx = 0
+        for col in range(cols):
+            if col % 2 == 0:
+                row_range = range(rows)
+            else:
+                row_range = range(rows - 1, -1, -1)
+            for row in row_range:
+                led_index[row * cols + col] = idx
+                if col == 0 or col == cols - 1 or row == 0 or row == rows - 1:
+                    self.edge_led_index[(row, col)] = idx
+                idx += 1
+        self.led_index = tuple(led_index)
+        self.led_frame = [(0, 0, 0)] * (cols * rows)
+        self.sent_frame = None
 
     def get_fill_character(self, number: int=1) -> str:
         """Returns a new character to use as a fill character"""
@@ -86,125 +186,136 @@ class Board:
         return blanks
 
     def get_board_text(self, terminal_mode: bool=True) -> list[str]:
+        if terminal_mode:
+            return [
+                ''.join(word.show(self.term, True) for word, _, _ in spans) + fill
+                for spans, fill in zip(self.word_spans, self.row_fills)
+            ]
+        #
         text = []
-        width, height = self.get_dimensions()
-        for idx, row in enumerate(self.rows):
-            text.append('')
-            for word in row:
-                text[-1] += f'{word.show(self.term, terminal_mode)}'
-            text[-1] = text[-1] + self.get_fill_character(width - len(text[-1]))
+        for template, spans in zip(self.text_templates, self.word_spans):
+            parts = []
+            position = 0
+            for word, start, end in spans:
+                if word.on:
+                    parts.append(template[position:start])
+                    parts.append(word.word.upper())
+                    position = end
+            if parts:
+                parts.append(template[position:])
+                text.append(''.join(parts))
+            else:
+                text.append(template)
         return text
 
-    def get_outer_edge(self) -> list[str]:
-        """Generate the view of the outer edge lights"""
-        text = []
-        width, height = self.get_dimensions()
-
-        for row in range(height):
-            for col in range(width):
-                if self.edge_lights.get((row, col)):
-                    light = self.term.move_xy(col, row + 1) + self.term.color_rgb(*self.edge_lights[(row, col)]) + '*'
-                    text.append(light)
-
-        text.append(self.term.move_xy(0, height + 2))
-
-        return text
+    def get_board_cells(self, text: list[str], terminal_mode: bool=True) -> list[list[terminal_renderer.Cell]]:
+        """Return the cells to show the board on the terminal, with the edge lights on top"""
+        cells: list[list[terminal_renderer.Cell]] = []
+        if terminal_mode:
+            for spans, fill in zip(self.word_spans, self.row_fills):
+                cells.append([cell for word, _, _ in spans for cell in word.show_cells(self.term)])
+                cells[-1].extend(('', letter) for letter in fill)
+        else:
+            cells = [[('', letter) for letter in line] for line in text]
+        #
+        for (row, col), color in self.edge_lights.items():
+            if color and 0 <= row < len(cells) and 0 <= col < len(cells[row]):
+                cells[row][col] = (self.term.color_rgb(*color), '*')
+        return cells
 
     def show_board(self, logs: list[str]) -> None:
-        print(self.term.home + self.term.clear)
-        text_lines = self.get_board_text(terminal_mode=self.lights is None)
+        terminal_mode = self.lights is None
+        text_lines = self.get_board_text(terminal_mode=terminal_mode)
+        screen: list[list[terminal_renderer.Cell]] = [[]]
         if self.show_board_on_terminal:
-            print('\n'.join(text_lines))
-            print('\n'.join(self.get_outer_edge()))
-            print()
+            screen.extend(self.get_board_cells(text_lines, terminal_mode))
+            screen.append([])
         #
-        print(self.term.green(
-            f"Time = {self.time.strftime('%H:%M')}, {timesayer.convert_to_text(self.time, show_a=self.show_a)}"))
-        print(self.term.green(f'Board {self.get_dimensions()}'))
+        green, red = self.term.green, self.term.red
+        screen.append(self.renderer.text_line(
+            f"Time = {self.time.strftime('%H:%M')}, {timesayer.convert_to_text(self.time, show_a=self.show_a)}", green))
+        screen.append(self.renderer.text_line(f'Board {self.get_dimensions()}', green))
+        logs = logs + list(self.renderer.messages)
+        if logs:
+            screen.extend([[], self.renderer.text_line('Logs', red), []])
+            screen.extend(self.renderer.text_line(line, red) for line in logs)
+        self.renderer.draw(screen)
         #
         if self.lights:
             self.do_lights(text_lines, self.lights)
         #
         if self.record_frames_to:
-            self.record_current_frame(text_lines)
-        #
-        if logs:
-            print(self.term.red('\nLogs\n'))
-            for line in logs:
-                print(self.term.red(line))
+            # The frame is the plain letters, whatever the screen shows
+            self.record_current_frame(text_lines if not terminal_mode else self.get_board_text(terminal_mode=False))
 
     def record_current_frame(self, text: list[str]) -> None:
         """"Record the current state of the board in a frame"""
         if self.record_frames_to:
-            filename = self.record_frames_to / f'frame-{self.recorded_frames}.json'
-            with open(filename, 'w') as f:
-                data: list[list[tuple[int, int, int]]] = []
-                rows, cols = self.get_dimensions()
-                for row in range(rows):
-                    data.append([])
-                    for col in range(cols):
-                        data[-1].append((0, 0, 0))
-                #
-                for col in range(cols):
-                    for row in range(rows):
-                        letter = text[row][col]
-                        if letter != ' ':
-                            data[row][col] = self.light_color if self.light_color else (0, 0, 0)
-
-                        # Check edge lights
-                        if col == 0 or col == cols - 1 or row == 0 or row == rows - 1:
-                            try:
-                                edge_color = self.edge_lights[(row, col)]
-                            except KeyError:
-                                pass  # OK, not lit
-                            else:
-                                if edge_color:
-                                    data[row][col] = edge_color
-                #
-                f.write(json.dumps({
-                    'button-data': (self.recorded_mode_button, self.recorded_action_button),
-                    'light-data': data,
-                }))
-                self.recorded_mode_button = self.recorded_action_button = False
+            cols, rows = self.get_dimensions()
+            if not self.recorder:
+                self.recorder = frame_recording.FrameRecorder(
+                    self.record_frames_to / 'frames.rec', rows, cols, self.record_compress
+                )
+            #
+            on = bytes(self.light_color) if self.light_color else bytes(3)
+            off = bytes(3)
+            data = bytearray(b''.join([on if letter != ' ' else off for letter in ''.join(text)]))
+            #
+            # Check edge lights
+            for position, edge_color in self.edge_lights.items():
+                if edge_color and position in self.edge_led_index:
+                    row, col = position
+                    data[(row * cols + col) * 3:(row * cols + col + 1) * 3] = bytes(edge_color)
+            #
+            self.recorder.write_frame(bytes(data), self.recorded_mode_button, self.recorded_action_button)
+            self.recorded_mode_button = self.recorded_action_button = False
             self.recorded_frames += 1
 
+    def stop_recording(self) -> None:
+        """Finish recording frames"""
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
 
     def do_lights(self, text: list[str], lights: Any) -> None:
         if not lights:
             return
-        lights.clear_strip()
         #
-        # Lights go down from 0 in the top left and then at the end of each row they
-        # bounce back up
-        idx = 0
-        rows, cols = self.get_dimensions()
-        for col in range(cols):
-            if col % 2 == 0:
-                row_range = range(rows)
-            else:
-                row_range = range(rows -1, -1, -1)
-            for row in row_range:
-                letter = text[row][col]
-                if letter != ' ':
-                    lights.set_led_color(idx, *self.light_color)
-
-                # Check edge lights
-                if col == 0 or col == cols - 1 or row == 0 or row == rows - 1:
-                    try:
-                        edge_color = self.edge_lights[(row, col)]
-                    except KeyError:
-                        pass # OK, not lit
-                    else:
-                        if edge_color:
-                            lights.set_led_color(idx, *edge_color)
-                        else:
-                            lights.set_led_color(idx, 0, 0, 0)
-
-                idx += 1
+        # Render the frame in LED order using the precomputed map
+        off = (0, 0, 0)
+        on = self.light_color or off
+        frame = self.led_frame
+        for led, letter in zip(self.led_index, ''.join(text)):
+            frame[led] = on if letter != ' ' else off
+        #
+        # Edge lights override the letters underneath them
+        for position, edge_color in self.edge_lights.items():
+            edge_led = self.edge_led_index.get(position)
+            if edge_led is not None:
+                frame[edge_led] = edge_color if edge_color else off
+        #
+        # Only send the lights that changed since the last frame - the strip
+        # remembers the rest, so if nothing changed there is nothing to send.
+        # A group of strips still needs updating, since it sends in the background
+        # and only raises and retries a failed send when it is updated
+        sent = self.sent_frame
+        if sent is None:
+            changed: Iterable[int] = range(len(frame))
+        else:
+            changed = [idx for idx, (color, old_color) in enumerate(zip(frame, sent)) if color != old_color]
+            if not changed and not isinstance(lights, led_strips.StripGroup):
+                return
+        for idx in changed:
+            lights.set_led_color(idx, *frame[idx])
         try:
             lights.update_strip()
         except OSError as err:
             raise Exception(f'Failed to send SPI data - is SPI interface turned on?: {err}')
+        self.sent_frame = frame[:]
+
+    def reset_lights(self) -> None:
+        """Forget what was sent to the lights so the next frame sends every light"""
+        self.sent_frame = None
 
 
     def clear_board(self) -> None:
@@ -227,25 +338,71 @@ class Board:
                 return possible_word
         raise ValueError(f'Could not find {word} in {self.time}')
 
+    def get_activation_plan(self, text: str) -> tuple[int, ...]:
+        """Return the indexes of the words in the face that spell out the text
+
+        The plan is worked out the first time the text is seen and then
+        reused, since the face never changes once it is built.
+        """
+        try:
+            return self.activation_plans[text]
+        except KeyError:
+            pass
+        plan = []
+        idx = 0
+        for word in text.split():
+            lower_word = word.lower()
+            while idx < len(self.all_words):
+                idx += 1
+                if self.all_words[idx - 1].word.lower() == lower_word:
+                    plan.append(idx - 1)
+                    break
+            else:
+                raise ValueError(f'Could not find {word} in {self.time}')
+        self.activation_plans[text] = result = tuple(plan)
+        return result
+
+    def activate_text(self, text: str) -> None:
+        """Activate the words in the face that spell out the text"""
+        for idx in self.get_activation_plan(text):
+            self.all_words[idx].activate()
+
     def update_board(self) -> list[str]:
         self.clear_board()
         logs = []
-        for mode in self.modes:
-            results = mode.update(self)
+        for results in mode_profiler.profiler.update_modes(self.modes, self):
             if results:
                 logs.extend(results)
 
         return logs
 
-    def convert_time(self) -> str:
+    def convert_time(self, t: datetime.datetime|None=None) -> str:
         it_is = 'It is ' if self.show_it_is else ''
-        return it_is + timesayer.convert_to_text(self.time, simple=self.simple,
+        return it_is + timesayer.convert_to_text(t or self.time, simple=self.simple,
                                          mode=timesayer.Mode.oclock if not self.month_mode else timesayer.Mode.short_date,
                                          twelve_mode=timesayer.TwelveMode.number,
                                          show_a=self.show_a
         )
 
+    def get_seconds_until_text_changes(self) -> float:
+        """Return how long until the words for the time change"""
+        if self.month_mode:
+            # The date only changes at midnight
+            midnight = datetime.datetime.combine(self.time.date() + datetime.timedelta(days=1), datetime.time())
+            return (midnight - self.time).total_seconds()
+        #
+        # The phrases change every few minutes so look for the next minute that reads differently
+        current_text = self.convert_time()
+        next_minute = self.time.replace(second=0, microsecond=0)
+        for _ in range(60):
+            next_minute += datetime.timedelta(minutes=1)
+            if self.convert_time(next_minute) != current_text:
+                break
+        return (next_minute - self.time).total_seconds()
+
     def get_dimensions(self) -> tuple[int, int]:
+        if self.dimensions:
+            return self.dimensions
         rows = len(self.rows)
         for row in self.rows:
             if row:
@@ -264,7 +421,7 @@ class Board:
 @click.option('--face-mode', type=click.Choice(list(faces.get_valid_faces())), required=True, help='Select which face mode')
 @click.option('--run-mode', default=RUN_MODES[0], type=click.Choice(RUN_MODES), help='Mode for running this command line')
 @click.option('--show-it-is', default=False, is_flag=True, help='Whether to show "it is" wording')
-@click.option('--light-mode', type=click.Choice(['off', 'simulate', 'real', 'detect']), default='off',
+@click.option('--light-mode', type=click.Choice(['off', 'simulate', 'fast-simulate', 'real', 'detect']), default='off',
               help='Set how to handle lights')
 @click.option('--light-color', type=str, default="#0A0A0A",
               help='The color for the lights when they are on (eg #ff0000)')
@@ -273,6 +430,8 @@ class Board:
 @click.option('--edge-character', type=str, default='■', help='Character to use for the edge')
 @click.option('--array-format', default=False, is_flag=True, help='When showing grid format it as python array')
 @click.option('--baud-rate', default=800, type=int, help='Baud rate for SPI communication')
+@click.option('--spi-device', type=str, multiple=True, default=['/dev/spidev0.0'],
+              help='SPI device the lights are on, give more than once to split the lights along several strips')
 @click.option('--button-key', default='b', type=str, help='Keyboard key to use to simulate the hardware time adjust button')
 @click.option('--mode-button-key', default='m', type=str, help='Keyboard key to use to simulate the hardware mode switch button')
 @click.option('--show-a', default=False, is_flag=True, help='Whether to show "a" in "a quarter to ..."')
@@ -285,13 +444,32 @@ class Board:
 @click.option('--set-system-time', is_flag=True, help="Whether to set the system time when using the adjustment button")
 @click.option('--record-frames-to', type=click.Path(), default="", help="Folder to record frames of the matrix")
 @click.option('--month-mode', is_flag=True, help="Whether to just show the months")
+@click.option('--record-compress', is_flag=True, help="Whether to compress the recorded frames")
+@click.option('--profile-startup', is_flag=True, help="Report how long the imports take when starting and exit")
+@click.option('--stats-file', type=click.Path(), default="stats/run_clock.json",
+              help="File to save the startup and tick timings to, empty for none")
+@click.option('--profile-modes', is_flag=True,
+              help="Time the updates of each mode, SIGUSR1 then saves a profile to the stats folder")
 def main(offset: int, time: str, interval: float, simulation_update: int,
          face_mode: str, run_mode: str, show_it_is: bool, light_mode: str, light_color: str,
          replace_blanks: bool, blank_character: str, edge_character: str, array_format: bool,
-         button_key: str, mode_button_key: str, baud_rate: int, show_a: bool, mode: str,
+         button_key: str, mode_button_key: str, baud_rate: int, spi_device: list[str], show_a: bool, mode: str,
          mode_parameters: list[str], qrcode_file: str, button_pin: int, mode_button_pin: int, set_system_time: bool,
-         record_frames_to: str, month_mode: bool) -> None:
-
+         record_frames_to: str, month_mode: bool, record_compress: bool, profile_startup: bool,
+         stats_file: str, profile_modes: bool) -> None:
+
+    if profile_startup:
+        print(f'{"total ms":>9} {"self ms":>9}  module')
+        for cumulative, own, module in profile_imports('run_clock')[:20]:
+            print(f'{cumulative / 1000:>9.1f} {own / 1000:>9.1f}  {module}')
+        return
+
+    # The light drivers sleep as they send, so only ticks that take a good part of the interval are slow
+    timeline = startup_timeline.Timeline('run_clock', pathlib.Path(stats_file) if stats_file else None,
+                                         slow_tick=interval / 2)
+    timeline.mark('imports')
+    if profile_modes:
+        mode_profiler.profiler.enable('run_clock')
     term = blessed.Terminal()
     if time:
         the_time = datetime.datetime.strptime(time, '%H:%M').time()
@@ -301,23 +479,29 @@ def main(offset: int, time: str, interval: float, simulation_update: int,
         current_offset = datetime.timedelta(minutes=offset)
     simulation_offset = datetime.timedelta(minutes=simulation_update)
 
+    lights: Callable[[int], Any]|None
     if light_mode == 'simulate':
         lights = lambda n: mocklights.MockLights(term, n)
+    elif light_mode == 'fast-simulate':
+        lights = lambda n: mocklights.FastMockLights(term, n)
     elif light_mode in ('real', 'detect'):
         try:
             from pi5neo import Pi5Neo  # type: ignore
         except ImportError:
             lights = None
         else:
-            lights = lambda n: Pi5Neo('/dev/spidev0.0', n, baud_rate)
+            lights = lambda n: led_strips.open_strips(spi_device, n, lambda device, m: Pi5Neo(device, m, baud_rate))
     else:
         lights = None
+    if lights:
+        lights = timed_lights(lights, timeline)
 
     display_modes = [modes.modes[name](mode_parameters) for name in mode]
 
     decoded_color = hex_to_rgb(light_color)
     if decoded_color is None:
         decoded_color = (255, 255, 255)
+    timeline.mark('config')
 
     b = Board(term, datetime.datetime.now(),
               simple=face_mode=='14x5', show_it_is=show_it_is,
@@ -326,12 +510,15 @@ def main(offset: int, time: str, interval: float, simulation_update: int,
               edge_character=edge_character,
               show_a=show_a, display=display_modes,
               record_frames_to=pathlib.Path(record_frames_to) if record_frames_to else None,
-              month_mode=month_mode
+              month_mode=month_mode, record_compress=record_compress
     )
     if light_mode == 'detect' and lights:
         b.show_board_on_terminal = False
+    # Printing would upset the renderer, so the timeline's lines are shown in the logs
+    timeline.write_log = b.renderer.log
 
     b.add_words(faces.faces[face_mode])
+    timeline.mark('face')
 
     def signal_handler(sig: int, frame: FrameType | None) -> None:
         """Handle the SIGTERM from SystemD"""
@@ -339,6 +526,10 @@ def main(offset: int, time: str, interval: float, simulation_update: int,
         if lights and b.lights:
             b.lights.clear_strip()
             b.lights.update_strip()
+            # Make sure the clear has been sent before exiting
+            b.close_lights()
+        b.stop_recording()
+        timeline.save()
         sys.exit(0)
 
     signal.signal(signal.SIGTERM, signal_handler)
@@ -370,22 +561,85 @@ def main(offset: int, time: str, interval: float, simulation_update: int,
         #
         print(f'The following {len(missing)} letters are missing: {", ".join(missing)}\n')
     else:
+        # The variables the config file set when the clock was started
+        try:
+            config_names = set(read_config_file(clock_updater.CONFIG_FILE))
+        except OSError:
+            config_names = set()
         updater = clock_updater.Updater(b, current_offset, term, interval, simulation_offset, lights,
-                          button_key, mode_button_key, set_system_time, qrcode_file)
+                          button_key, mode_button_key, set_system_time, qrcode_file,
+                          settings=dict(click.get_current_context().params),
+                          read_settings=lambda: read_settings(sys.argv[1:], config_names), timeline=timeline)
 
         if button_pin != -1:
             import gpiozero  # type: ignore
             button = gpiozero.Button(button_pin)
-            button.when_pressed = updater.mode_button_press
+            button.when_pressed = lambda: updater.post_event(clock_updater.UpdaterEvent.MODE_BUTTON)
         if mode_button_pin != -1:
             import gpiozero
             mode_button = gpiozero.Button(mode_button_pin)
-            mode_button.when_pressed = updater.action_button_press
+            mode_button.when_pressed = lambda: updater.post_event(clock_updater.UpdaterEvent.ACTION_BUTTON)
 
         updater.update()
 
 
 
+def timed_lights(lights: Callable[[int], Any], timeline: startup_timeline.Timeline) -> Callable[[int], Any]:
+    """Return a function to open the lights which marks when they were opened on the timeline"""
+    def open_lights(n: int) -> Any:
+        driver = lights(n)
+        timeline.mark('lights')
+        return driver
+    return open_lights
+
+
+def profile_imports(module: str) -> list[tuple[int, int, str]]:
+    """Return the (cumulative us, self us, name) of the imports made by a module, slowest first
+
+    The module is imported in a fresh interpreter so that everything it
+    needs is imported again.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        if match := re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (.*)$', line):
+            timings.append((int(match[2]), int(match[1]), match[3].rstrip()))
+    return sorted(timings, reverse=True)
+
+
+def read_config_file(filename: str) -> dict[str, str]:
+    """Return the variables set in a shell config file like config/config.sh"""
+    values = {}
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = shlex.split(line, comments=True)
+            if parts and parts[0] == 'export':
+                parts = parts[1:]
+            for part in parts:
+                name, equals, value = part.partition('=')
+                if equals:
+                    values[name] = value
+    return values
+
+
+def read_settings(args: list[str], config_names: set[str]) -> dict[str, Any]:
+    """Return the command line options as they would be if the clock was started again now
+
+    The config file is put into the environment, taking out the variables it
+    set last time (given by config_names, which is updated) that it no
+    longer sets.
+    """
+    values = read_config_file(clock_updater.CONFIG_FILE)
+    for name in config_names - values.keys():
+        os.environ.pop(name, None)
+    os.environ.update(values)
+    config_names.clear()
+    config_names.update(values)
+    ctx = main.make_context('run_clock', list(args), auto_envvar_prefix='CLOCK')
+    return dict(ctx.params)
+
+
 def hex_to_rgb(hex_color: str) -> tuple[int, int, int]|None:
     """
     Converts a hex color code (e.g., "#14944c") to a tuple of RGB integers.
@@ -0,0 +1,126 @@
+"""Recording how long the clock takes to start and how long each tick takes
+
+Milestones are timed from when the process started, which is read from
+/proc where it exists so that the time taken to start Python and import
+everything is included. When the first frame has been shown the timeline
+is logged as one JSON line and saved to the stats file, which is then
+kept up to date with the tick timings. Slow ticks are logged as they
+happen. The log lines go to stderr, or to write_log if it is given (eg a
+renderer's log, so they don't upset what is drawn on the terminal).
+"""
+import collections
+import datetime
+import json
+import os
+import pathlib
+import statistics
+import sys
+import time
+from typing import Any, Callable, TextIO
+
+
+def get_process_start() -> tuple[float, float|None]:
+    """Return the time the process started and how long the system had been up then, if known"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # The process name can have spaces so skip past it, starttime is then the 20th field
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        started_after_boot = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time(), None
+    return time.time() - uptime + started_after_boot, started_after_boot
+
+
+class Timeline:
+    """The startup milestones and tick timings of a process"""
+
+    def __init__(self, name: str, stats_file: pathlib.Path|None=None, out: TextIO|None=None,
+                 slow_tick: float=0.1, save_every: float=60.0, write_log: Callable[[str], None]|None=None) -> None:
+        """Initialise the timeline, ticks taking slow_tick seconds or more are logged"""
+        self.name = name
+        self.stats_file = stats_file
+        self.out = out or sys.stderr
+        self.write_log = write_log
+        self.slow_tick = slow_tick
+        self.save_every = save_every
+        self.start, self.started_after_boot = get_process_start()
+        self.milestones: dict[str, float] = {}
+        self.tick_times: collections.deque[float] = collections.deque(maxlen=1000)
+        self.ticks = 0
+        self.max_tick = 0.0
+        self.slow_ticks: collections.deque[tuple[str, float]] = collections.deque(maxlen=20)
+        self.last_saved = 0.0
+
+    def mark(self, milestone: str) -> None:
+        """Record that a milestone has been reached, only the first time counts"""
+        if milestone not in self.milestones:
+            self.milestones[milestone] = time.time() - self.start
+
+    def add_tick(self, seconds: float) -> None:
+        """Record how long a tick took"""
+        self.ticks += 1
+        self.tick_times.append(seconds)
+        self.max_tick = max(self.max_tick, seconds)
+        if 'first_frame' not in self.milestones:
+            self.mark('first_frame')
+            self.log('startup', self.get_stats())
+            self.save()
+            return
+        if seconds >= self.slow_tick:
+            when = datetime.datetime.now().isoformat(timespec='seconds')
+            self.slow_ticks.append((when, seconds))
+            self.log('slow_tick', {'name': self.name, 'at': when, 'ms': round(seconds * 1000, 1)})
+        if time.monotonic() - self.last_saved >= self.save_every:
+            self.save()
+
+    def get_tick_stats(self) -> dict[str, float]:
+        """Return the statistics of the recent ticks in ms"""
+        ticks = [seconds * 1000 for seconds in self.tick_times]
+        if len(ticks) < 2:
+            return {'count': self.ticks, 'max': round(self.max_tick * 1000, 3)}
+        percentiles = statistics.quantiles(ticks, n=100, method='inclusive')
+        return {
+            'count': self.ticks,
+            'p50': round(percentiles[49], 3),
+            'p90': round(percentiles[89], 3),
+            'p99': round(percentiles[98], 3),
+            'max': round(self.max_tick * 1000, 3),
+        }
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return everything recorded"""
+        return {
+            'name': self.name,
+            'pid': os.getpid(),
+            'started': datetime.datetime.fromtimestamp(self.start).isoformat(timespec='seconds'),
+            'started_after_boot': self.started_after_boot,
+            'milestones': {milestone: round(seconds, 3) for milestone, seconds in self.milestones.items()},
+            'ticks': self.get_tick_stats(),
+            'slow_ticks': [{'at': when, 'ms': round(seconds * 1000, 1)} for when, seconds in self.slow_ticks],
+        }
+
+    def log(self, event: str, data: dict[str, Any]) -> None:
+        """Write a structured log line"""
+        self.write(f'{event} {json.dumps(data)}')
+
+    def write(self, line: str) -> None:
+        """Write a line to the log"""
+        if self.write_log:
+            self.write_log(line)
+        else:
+            print(line, file=self.out, flush=True)
+
+    def save(self) -> None:
+        """Write the stats file, replacing it in one go so it is never seen half written"""
+        self.last_saved = time.monotonic()
+        if not self.stats_file:
+            return
+        try:
+            self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+            temporary_file = self.stats_file.with_name(self.stats_file.name + '.tmp')
+            temporary_file.write_text(json.dumps(self.get_stats(), indent=2))
+            os.replace(temporary_file, self.stats_file)
+        except OSError as err:
+            self.write(f'Could not save stats to {self.stats_file}: {err}')
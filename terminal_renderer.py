@@ -0,0 +1,93 @@
+"""Drawing to the terminal by only redrawing the cells that changed"""
+import collections
+import sys
+from typing import TextIO
+
+import blessed
+
+
+Cell = tuple[str, str]     # (style sequence, character)
+
+
+class TerminalRenderer:
+    """Draws lines of cells to the terminal, remembering what was drawn last time
+
+    Only the cells that changed are redrawn, the cursor is only moved when
+    the next changed cell isn't where it already is and the style is only
+    sent when it changes, so a run of cells in the same color costs one
+    style sequence. The whole update is written in one go. If the terminal
+    can't move the cursor then the lines are printed as plain text whenever
+    they change.
+
+    Anything else printed to the terminal would throw out what the renderer
+    thinks is on the screen, so messages are given to log() instead and the
+    most recent are kept to be drawn with the lines.
+    """
+
+    def __init__(self, term: blessed.Terminal, out: TextIO|None=None, max_messages: int=5) -> None:
+        """Initialise the renderer"""
+        self.term = term
+        self.out = out or sys.stdout
+        self.lines: list[list[Cell]]|None = None
+        self.messages: collections.deque[str] = collections.deque(maxlen=max_messages)
+
+    def log(self, message: str) -> None:
+        """Keep a message to show the next time the lines are drawn"""
+        self.messages.append(message)
+
+    def reset(self) -> None:
+        """Forget what was drawn so the next draw clears the screen and draws everything"""
+        self.lines = None
+
+    def render(self, lines: list[list[Cell]]) -> str:
+        """Return the output needed to change the screen from what was drawn last time to these lines"""
+        term = self.term
+        if not term.does_styling:
+            # No cursor movement (eg output to a log), so just print the lines when they change
+            if lines == self.lines:
+                return ''
+            self.lines = [line[:] for line in lines]
+            return ''.join(''.join(character for _, character in line) + '\n' for line in lines)
+        #
+        parts = []
+        previous = self.lines
+        if previous is None:
+            parts.append(term.home + term.clear)
+            previous = []
+        cursor: tuple[int, int]|None = None
+        style: str|None = None
+        for y, line in enumerate(lines):
+            old_line = previous[y] if y < len(previous) else []
+            for x, cell in enumerate(line):
+                if x < len(old_line) and old_line[x] == cell:
+                    continue
+                if cursor != (x, y):
+                    parts.append(term.move_xy(x, y))
+                if cell[0] != style:
+                    style = cell[0]
+                    parts.append(term.normal + style)
+                parts.append(cell[1])
+                cursor = (x + 1, y)
+            if len(line) < len(old_line):
+                # Line got shorter so clear the rest of it
+                style = None
+                parts.append(term.move_xy(len(line), y) + term.normal + term.clear_eol)
+        for y in range(len(lines), len(previous)):
+            if previous[y]:
+                parts.append(term.move_xy(0, y) + term.normal + term.clear_eol)
+        #
+        if parts:
+            parts.append(term.normal + term.move_xy(0, len(lines)))
+        self.lines = [line[:] for line in lines]
+        return ''.join(parts)
+
+    def draw(self, lines: list[list[Cell]]) -> None:
+        """Update the screen to show the lines"""
+        output = self.render(lines)
+        if output:
+            self.out.write(output)
+            self.out.flush()
+
+    def text_line(self, text: str, style: str='') -> list[Cell]:
+        """Return a line of cells showing some text in one style"""
+        return [(style, character) for character in text]
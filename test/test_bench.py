@@ -0,0 +1,34 @@
+import blessed
+import pytest
+from click.testing import CliRunner
+
+import bench
+import faces
+
+
+def test_combinations_include_edge_modes_with_the_time() -> None:
+    combinations = bench.get_mode_combinations()
+    assert ['Normal'] in combinations
+    assert ['Normal', 'EdgeLightSeconds'] in combinations
+
+
+def test_benchmark_times_every_stage() -> None:
+    board = bench.make_board(blessed.Terminal(), '16x16', ['Normal'])
+    results = bench.benchmark(board, 3, allocations=True)
+    assert list(results) == bench.STAGES
+    for result in results.values():
+        assert 0 < result['p50'] <= result['max']
+        assert result['alloc'] >= 0
+
+
+@pytest.mark.parametrize('face', faces.get_valid_faces())
+def test_the_time_can_be_benchmarked_on_every_face(face: str) -> None:
+    board = bench.make_board(blessed.Terminal(), face, ['Normal'])
+    results = bench.benchmark(board, 2, allocations=False)
+    assert list(results) == bench.STAGES
+
+
+def test_too_few_minutes_is_an_error() -> None:
+    result = CliRunner().invoke(bench.main, ['--face', '16x16', '--mode', 'Normal', '--minutes', '1'])
+    assert result.exit_code == 2
+    assert 'minutes' in result.output
@@ -0,0 +1,196 @@
+import asyncio
+import copy
+import datetime
+import pathlib
+import time
+
+import blessed
+import pytest
+from unittest.mock import Mock
+
+import clock_updater
+import faces
+import modes
+import wificonfig
+from clock_updater import Updater, UpdaterEvent, UpdateModes
+from run_clock import Board
+
+
+@pytest.fixture
+def updater() -> Updater:
+    term = blessed.Terminal()
+    board = Board(term, datetime.datetime(2024, 1, 1, 3, 0),
+                  lights=lambda n: Mock(), light_color=(1, 2, 3), display=[modes.Normal(None)])
+    board.add_words(copy.deepcopy(faces.faces['16x16full']))
+    return Updater(board, datetime.timedelta(), term, 0.01, datetime.timedelta(), None, 'm', 'a', False, '')
+
+
+async def run_until(updater: Updater, done: asyncio.Event) -> int:
+    """Run the updater until the event is set and then quit"""
+    async def quit_when_done() -> None:
+        await done.wait()
+        updater.post_event(UpdaterEvent.QUIT)
+    task = asyncio.create_task(quit_when_done())
+    result = await updater.run()
+    task.cancel()
+    return result
+
+
+def test_update_delay_is_capped_so_wall_clock_jumps_show(updater: Updater) -> None:
+    updater.board.month_mode = True
+    assert updater.get_update_delay() == clock_updater.MAX_UPDATE_DELAY
+    updater.board.modes = [modes.EdgeLightBlank(None)]
+    assert updater.get_update_delay() is None
+
+
+def test_button_events_are_handled_by_render_task(updater: Updater) -> None:
+    async def run() -> int:
+        done = asyncio.Event()
+
+        def press() -> None:
+            updater.post_event(UpdaterEvent.MODE_BUTTON)
+            done.set()
+        asyncio.get_running_loop().call_later(0.05, press)
+        return await run_until(updater, done)
+    assert asyncio.run(run()) == 0
+    assert updater.mode == UpdateModes.CONFIG_HOURS
+    assert updater.board.recorded_mode_button
+
+
+def test_only_timed_ticks_count_down_config_mode(updater: Updater) -> None:
+    updater.interval = 10
+    updater.mode_button_press()
+    assert updater.events is None
+
+    async def run() -> int:
+        done = asyncio.Event()
+
+        def send_events() -> None:
+            for _ in range(5):
+                updater.post_event(UpdaterEvent.NEW_DATA)
+            updater.show_config((1, 2, 3), (True, False, False, False))
+            done.set()
+        asyncio.get_running_loop().call_later(0.05, send_events)
+        return await run_until(updater, done)
+    assert asyncio.run(run()) == 0
+    # Only the first tick was timed
+    assert updater.mode_cancel_timer == 5
+    assert updater.mode == UpdateModes.CONFIG_HOURS
+    assert updater.config_mode.color == (1, 2, 3)
+
+
+def test_config_change_exits_for_restart(updater: Updater, tmp_path: pathlib.Path,
+                                        monkeypatch: pytest.MonkeyPatch) -> None:
+    config_file = tmp_path / 'config.sh'
+    config_file.write_text('CLOCK_INTERVAL=0.5\n')
+    monkeypatch.setattr(clock_updater, 'CONFIG_FILE', config_file)
+
+    async def run() -> int:
+        asyncio.get_running_loop().call_later(0.05, config_file.write_text, 'CLOCK_INTERVAL=1\n')
+        return await updater.run()
+    assert asyncio.run(run()) == 2
+
+
+def test_restarting_for_a_config_change_cleans_up(updater: Updater, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def restart() -> int:
+        return 2
+    monkeypatch.setattr(updater, 'run', restart)
+    updater.lights = lambda n: Mock()
+    lights = updater.board.lights
+    assert isinstance(lights, Mock)
+    recorder = updater.board.recorder = Mock()
+    with pytest.raises(SystemExit) as exit_info:
+        updater.update()
+    assert exit_info.value.code == 2
+    lights.clear_strip.assert_called_once()
+    lights.close.assert_called_once()
+    recorder.close.assert_called_once()
+
+
+def test_board_keeps_updating_while_reading_qr_code(updater: Updater) -> None:
+    updater.wifi_config.max_retries = 1
+
+    def slow_get_qr() -> bool:
+        time.sleep(0.2)
+        return False
+    updater.wifi_config.get_qr = slow_get_qr    # type: ignore[method-assign]
+    updater.mode = UpdateModes.CONFIG_QR
+    updater.board.modes = updater.config_modes
+    updates = []
+    update_board = updater.update_board
+
+    def counting_update_board() -> list[str]:
+        updates.append(time.monotonic())
+        return update_board()
+    updater.update_board = counting_update_board    # type: ignore[method-assign]
+
+    async def run() -> int:
+        done = asyncio.Event()
+        finish_wifi = updater.finish_wifi
+
+        def finish(result: wificonfig.WifiConfigStage, ip_address: str|None=None) -> None:
+            finish_wifi(result, ip_address)
+            done.set()
+        updater.finish_wifi = finish    # type: ignore[method-assign]
+        return await run_until(updater, done)
+    assert asyncio.run(run()) == 0
+    assert updater.wifi_config.wifi_stage == wificonfig.WifiConfigStage.NO_QR_READ
+    assert updater.mode == UpdateModes.NORMAL
+    assert len(updates) > 5
+
+
+def test_failed_wifi_configuration_leaves_config_mode(updater: Updater) -> None:
+    def failing_get_qr() -> bool:
+        raise FileNotFoundError('rpicam-still')
+    updater.wifi_config.get_qr = failing_get_qr    # type: ignore[method-assign]
+    updater.mode = UpdateModes.CONFIG_QR
+    updater.board.modes = updater.config_modes
+
+    async def run() -> int:
+        done = asyncio.Event()
+        finish_wifi = updater.finish_wifi
+
+        def finish(result: wificonfig.WifiConfigStage, ip_address: str|None=None) -> None:
+            finish_wifi(result, ip_address)
+            done.set()
+        updater.finish_wifi = finish    # type: ignore[method-assign]
+        return await run_until(updater, done)
+    assert asyncio.run(run()) == 0
+    assert updater.wifi_config.wifi_stage == wificonfig.WifiConfigStage.FAILED
+    assert updater.mode == UpdateModes.NORMAL
+    assert updater.wifi_task is None
+    assert 'rpicam-still' in updater.board.renderer.messages[-1]
+
+
+class TestReloadConfig:
+
+    settings = {'face_mode': '16x16full', 'mode': ('Normal',), 'mode_parameters': (), 'interval': 0.01,
+                'light_color': '#010203', 'show_it_is': False, 'show_a': False, 'baud_rate': 800}
+
+    def test_live_settings_are_applied_in_place(self, updater: Updater) -> None:
+        new_settings = self.settings | {'face_mode': '10x11', 'mode': ('Normal', 'EdgeLightRWB'),
+                                        'interval': 0.2, 'light_color': '#ff0000', 'show_it_is': True}
+        updater.settings = dict(self.settings)
+        updater.read_settings = lambda: new_settings
+        board = updater.board
+        assert updater.reload_config()
+        assert updater.board is board
+        assert updater.interval == 0.2
+        assert [type(mode) for mode in board.modes] == [modes.Normal, modes.EdgeLightRWB]
+        assert board.light_color == (255, 0, 0)
+        assert board.show_it_is
+        assert board.get_dimensions() == (11, 11)
+
+    def test_other_settings_need_a_restart(self, updater: Updater) -> None:
+        updater.settings = dict(self.settings)
+        updater.read_settings = lambda: self.settings | {'baud_rate': 1000}
+        assert not updater.reload_config()
+
+    def test_config_mode_keeps_going_when_modes_change(self, updater: Updater) -> None:
+        updater.settings = dict(self.settings)
+        updater.read_settings = lambda: self.settings | {'mode': ('EdgeLightRWB',)}
+        updater.mode_button_press()
+        assert updater.reload_config()
+        assert updater.board.modes == updater.config_modes
+        updater.reset_config()
+        assert [type(mode) for mode in updater.board.modes] == [modes.EdgeLightRWB]
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import pathlib
+
+import pytest
+
+import file_watcher
+from file_watcher import FileWatcher
+
+
+@pytest.fixture(params=[False, True], ids=['polling', 'inotify'])
+def watcher(request: pytest.FixtureRequest) -> FileWatcher:
+    if request.param and not FileWatcher().use_inotify:
+        pytest.skip('inotify is not available')
+    return FileWatcher(poll_interval=0.01, use_inotify=request.param)
+
+
+def test_file_is_checked_when_not_running(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / 'data.json'
+    filename.write_text('{"a": 1}')
+    watcher = FileWatcher()
+    assert watcher.get_json(filename) == {'a': 1}
+    version = watcher.get_version(filename)
+    filename.write_text('{"a": 22}')
+    assert watcher.get_version(filename) == version + 1
+    assert watcher.get_json(filename) == {'a': 22}
+
+
+def test_parsed_json_is_cached(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    filename = tmp_path / 'data.json'
+    filename.write_text('{"a": 1}')
+    watcher = FileWatcher()
+    first = watcher.get_json(filename)
+    monkeypatch.setattr(file_watcher.json, 'load', lambda f: pytest.fail('File was parsed again'))
+    assert watcher.get_json(filename) is first
+
+
+def test_subscribers_are_told_about_changes(tmp_path: pathlib.Path, watcher: FileWatcher) -> None:
+    filename = tmp_path / 'data.json'
+    other = tmp_path / 'other.json'
+    filename.write_text('{"a": 1}')
+    changes: list[pathlib.Path] = []
+    watcher.subscribe(filename, changes.append)
+
+    async def run() -> None:
+        task = asyncio.create_task(watcher.run())
+        await asyncio.sleep(0.05)
+        other.write_text('{}')
+        await asyncio.sleep(0.05)
+        assert changes == []
+        filename.write_text(json.dumps({'a': 2}))
+        for _ in range(100):
+            if changes:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+    asyncio.run(run())
+    assert changes == [filename]
+    assert watcher.get_json(filename) == {'a': 2}
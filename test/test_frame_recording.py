@@ -0,0 +1,94 @@
+import json
+import pathlib
+
+import pytest
+
+from frame_recording import FrameRecorder, FrameReader, FrameRecordingError, convert_json_frames
+
+
+def make_frame(value: int, rows: int=2, cols: int=3) -> bytes:
+    return bytes([value, value + 1, value + 2]) * (rows * cols)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+class TestRecording:
+
+    def test_frames_can_be_read_back(self, tmp_path: pathlib.Path, compress: bool) -> None:
+        recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3, compress, chunk_frames=4)
+        for idx in range(10):
+            recorder.write_frame(make_frame(idx), idx == 3, idx == 5, 100.0 + idx)
+        recorder.close()
+        #
+        reader = FrameReader(tmp_path / 'frames.rec')
+        assert (reader.rows, reader.cols, reader.compressed) == (2, 3, compress)
+        frames = list(reader)
+        assert len(frames) == 10
+        for idx, frame in enumerate(frames):
+            assert frame.timestamp == 100.0 + idx
+            assert frame.colors == make_frame(idx)
+            assert frame.mode_button == (idx == 3)
+            assert frame.action_button == (idx == 5)
+
+    def test_frames_can_be_shown_as_rows(self, tmp_path: pathlib.Path, compress: bool) -> None:
+        recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3, compress)
+        recorder.write_frame(make_frame(7))
+        recorder.close()
+        frame = next(iter(FrameReader(tmp_path / 'frames.rec')))
+        assert frame.get_light_data(3) == [[(7, 8, 9)] * 3] * 2
+
+    def test_recording_again_keeps_the_earlier_frames(self, tmp_path: pathlib.Path, compress: bool) -> None:
+        for start in (0, 10):
+            recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3, compress, chunk_frames=4)
+            for idx in range(start, start + 10):
+                recorder.write_frame(make_frame(idx))
+            recorder.close()
+        frames = list(FrameReader(tmp_path / 'frames.rec'))
+        assert [frame.colors for frame in frames] == [make_frame(idx) for idx in range(20)]
+
+    def test_partly_written_frames_are_dropped(self, tmp_path: pathlib.Path, compress: bool) -> None:
+        recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3, compress, chunk_frames=1)
+        recorder.write_frame(make_frame(0))
+        recorder.close()
+        with open(tmp_path / 'frames.rec', 'ab') as f:
+            f.write(b'\1\2\3\4\5')
+        recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3, compress)
+        recorder.write_frame(make_frame(1))
+        recorder.close()
+        frames = list(FrameReader(tmp_path / 'frames.rec'))
+        assert [frame.colors for frame in frames] == [make_frame(0), make_frame(1)]
+
+    def test_recording_a_different_grid_moves_the_old_file_aside(self, tmp_path: pathlib.Path, compress: bool) -> None:
+        recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3, compress)
+        recorder.write_frame(make_frame(0))
+        recorder.close()
+        recorder = FrameRecorder(tmp_path / 'frames.rec', 3, 3, compress)
+        recorder.write_frame(make_frame(1, 3, 3))
+        recorder.close()
+        old_file, = tmp_path.glob('frames-*.rec')
+        assert [frame.colors for frame in FrameReader(old_file)] == [make_frame(0)]
+        assert [frame.colors for frame in FrameReader(tmp_path / 'frames.rec')] == [make_frame(1, 3, 3)]
+
+    def test_json_frames_can_be_converted(self, tmp_path: pathlib.Path, compress: bool) -> None:
+        for idx in range(12):
+            with open(tmp_path / f'frame-{idx}.json', 'w') as f:
+                f.write(json.dumps({
+                    'button-data': (idx == 1, False),
+                    'light-data': [[(idx, idx, idx)] * 3] * 2,
+                }))
+        assert convert_json_frames(tmp_path, tmp_path / 'frames.rec', compress) == 12
+        frames = list(FrameReader(tmp_path / 'frames.rec'))
+        assert [frame.colors[0] for frame in frames] == list(range(12))
+        assert [frame.mode_button for frame in frames] == [idx == 1 for idx in range(12)]
+
+
+def test_wrong_frame_size_fails(tmp_path: pathlib.Path) -> None:
+    recorder = FrameRecorder(tmp_path / 'frames.rec', 2, 3)
+    with pytest.raises(ValueError):
+        recorder.write_frame(make_frame(0, 3, 3))
+    recorder.close()
+
+
+def test_reading_other_file_fails(tmp_path: pathlib.Path) -> None:
+    (tmp_path / 'frame-0.json').write_text('{"light-data": []}')
+    with pytest.raises(FrameRecordingError):
+        FrameReader(tmp_path / 'frame-0.json')
@@ -0,0 +1,171 @@
+import threading
+import time
+
+from unittest.mock import Mock
+
+import pytest
+
+from led_strips import StripGroup, open_strips, send_frame, split_strip
+from mocklights import FastMockLights
+
+
+class SlowMockLights(FastMockLights):
+    """Mock lights that take a while to send, like a long strip on SPI"""
+
+    def __init__(self, num_leds: int, delay: float) -> None:
+        super().__init__(None, num_leds, keep_frames=True)
+        self.delay = delay
+        self.threads: set[str] = set()
+
+    def update_strip(self, sleep_duration: float=0.1) -> None:
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        super().update_strip(sleep_duration)
+
+
+class FailingMockLights(FastMockLights):
+    """Mock lights where the first sends fail, like SPI being turned off"""
+
+    def __init__(self, num_leds: int, failures: int) -> None:
+        super().__init__(None, num_leds, keep_frames=True)
+        self.failures = failures
+
+    def update_strip(self, sleep_duration: float=0.1) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError('SPI send failed')
+        super().update_strip(sleep_duration)
+
+
+@pytest.fixture
+def strips() -> list[FastMockLights]:
+    return [FastMockLights(None, 2, keep_frames=True), FastMockLights(None, 3, keep_frames=True)]
+
+
+class TestStripGroup:
+
+    def test_leds_are_split_along_the_strips(self, strips: list[FastMockLights]) -> None:
+        group = StripGroup(strips, [2, 3])
+        assert group.num_leds == 5
+        assert group.set_led_color(1, 1, 1, 1)
+        assert group.set_led_color(2, 2, 2, 2)
+        assert not group.set_led_color(5, 3, 3, 3)
+        group.update_strip()
+        group.wait()
+        assert strips[0].snapshot() == bytes(3) + bytes((1, 1, 1))
+        assert strips[1].snapshot() == bytes((2, 2, 2)) + bytes(6)
+
+    def test_whole_frame_is_split(self, strips: list[FastMockLights]) -> None:
+        group = StripGroup(strips, [2, 3])
+        send_frame(group, bytes(range(15)))
+        group.close()
+        assert strips[0].snapshot() == bytes(range(6))
+        assert strips[1].snapshot() == bytes(range(6, 15))
+        with pytest.raises(ValueError):
+            group.set_frame(bytes(3))
+
+    def test_unchanged_strips_are_not_sent_again(self, strips: list[FastMockLights]) -> None:
+        group = StripGroup(strips, [2, 3])
+        group.update_strip()
+        group.set_led_color(4, 9, 9, 9)
+        group.update_strip()
+        group.update_strip()
+        group.wait()
+        assert [strip.updates for strip in strips] == [1, 2]
+
+    def test_later_changes_do_not_alter_the_frame_being_sent(self) -> None:
+        strip = SlowMockLights(1, 0.05)
+        group = StripGroup([strip], [1])
+        group.fill_strip(1, 1, 1)
+        group.update_strip()
+        group.fill_strip(2, 2, 2)
+        group.update_strip()
+        group.wait()
+        assert strip.frames == [bytes((1, 1, 1)), bytes((2, 2, 2))]
+
+    def test_strips_are_sent_at_the_same_time(self) -> None:
+        strips = [SlowMockLights(4, 0.1) for _ in range(4)]
+        group = StripGroup(strips, [4] * 4)
+        start = time.perf_counter()
+        group.fill_strip(1, 2, 3)
+        group.update_strip()
+        assert time.perf_counter() - start < 0.1
+        group.wait()
+        assert time.perf_counter() - start < 0.3
+        assert len(set.union(*(strip.threads for strip in strips))) == 4
+
+    def test_missing_strips_are_skipped(self) -> None:
+        strip = FastMockLights(None, 2)
+        group = StripGroup([None, strip], [2, 2])
+        group.fill_strip(5, 5, 5)
+        group.update_strip()
+        group.close()
+        assert strip.snapshot() == bytes((5, 5, 5)) * 2
+
+    def test_failed_send_is_raised_and_sent_again(self) -> None:
+        strip = FailingMockLights(1, 1)
+        group = StripGroup([strip], [1])
+        group.fill_strip(1, 1, 1)
+        group.update_strip()
+        with pytest.raises(OSError):
+            group.wait()
+        group.update_strip()
+        group.close()
+        assert strip.frames == [bytes((1, 1, 1))]
+
+    def test_failed_send_is_raised_by_the_next_update(self) -> None:
+        strip = FailingMockLights(1, 1)
+        group = StripGroup([strip], [1])
+        group.fill_strip(1, 1, 1)
+        group.update_strip()
+        while group.pending[0] and not group.pending[0].done():
+            time.sleep(0.01)
+        with pytest.raises(OSError):
+            group.update_strip()
+        group.update_strip()
+        group.close()
+        assert strip.frames == [bytes((1, 1, 1))]
+
+    def test_close_raises_a_failed_last_send(self) -> None:
+        group = StripGroup([FailingMockLights(1, 1)], [1])
+        group.update_strip()
+        with pytest.raises(OSError):
+            group.close()
+        assert group.executor._shutdown
+
+    def test_sleep_duration_is_passed_to_the_strips(self) -> None:
+        strip = SlowMockLights(1, 0)
+        strip.update_strip = Mock()  # type: ignore[method-assign]
+        group = StripGroup([strip], [1])
+        group.update_strip(0.5)
+        group.close()
+        strip.update_strip.assert_called_once_with(0.5)
+
+    def test_close_closes_the_strips(self) -> None:
+        strip = Mock()
+        pi5neo = Mock(spec=['set_led_color', 'update_strip', 'spi'])
+        group = StripGroup([strip, None, pi5neo], [1, 1, 1])
+        group.close()
+        strip.close.assert_called_once()
+        pi5neo.spi.close.assert_called_once()
+
+
+class TestOpenStrips:
+
+    def test_split_is_as_even_as_possible(self) -> None:
+        assert split_strip(10, 3) == [4, 3, 3]
+        assert split_strip(256, 2) == [128, 128]
+
+    def test_one_device_is_just_the_strip(self) -> None:
+        lights = open_strips(['a'], 5, lambda device, n: FastMockLights(None, n))
+        assert isinstance(lights, FastMockLights)
+        assert lights.num_leds == 5
+
+    def test_several_devices_are_a_group(self) -> None:
+        opened = []
+        def open_strip(device: str, n: int) -> FastMockLights:
+            opened.append((device, n))
+            return FastMockLights(None, n)
+        lights = open_strips(['a', 'b'], 5, open_strip)
+        assert isinstance(lights, StripGroup)
+        assert opened == [('a', 3), ('b', 2)]
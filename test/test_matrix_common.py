@@ -1,5 +1,6 @@
 import pytest
-from matrix_common import Light, LightCollection, WHITE, RED, BLACK, GRID, COORD, NoSuchLight, OutOfGridRange
+from matrix_common import Light, LightCollection, ArrayLightCollection, LightView, WHITE, RED, BLUE, BLACK, GRID, COORD, NoSuchLight, OutOfGridRange
+from matrix_common import COLOR, Panel, Wiring, check_panels, get_exporter, get_led_order, get_tiled_led_order
 
 
 @pytest.fixture
@@ -193,3 +194,128 @@ class TestLightCollection:
 
     def test_can_check_number_of_lights(self, light_collection: LightCollection) -> None:
         assert len(light_collection) == 2*3
+
+
+@pytest.mark.parametrize('collection_class', [LightCollection, ArrayLightCollection])
+class TestBulkOperations:
+
+    def test_fill_sets_every_light(self, collection_class: type[LightCollection]) -> None:
+        lc = collection_class(GRID(2, 3))
+        lc.fill(RED)
+        assert all(light.color == RED and light.on for light in lc)
+        lc.fill(BLUE, on=None)
+        assert all(light.color == BLUE and light.on for light in lc)
+        lc.fill(BLUE, on=False)
+        assert not any(light.on for light in lc)
+
+    def test_shown_bytes_are_row_by_row(self, collection_class: type[LightCollection]) -> None:
+        lc = collection_class(GRID(2, 3))
+        lc.get_light_at(COORD(0, 1)).set_color(RED)
+        lc.get_light_at(COORD(1, 2)).set_color(BLUE)
+        assert lc.get_shown_bytes() == bytes(BLACK) + bytes(RED) + bytes(BLACK) * 3 + bytes(BLUE)
+
+    def test_copy_is_independent(self, collection_class: type[LightCollection]) -> None:
+        lc = collection_class(GRID(2, 3))
+        lc.get_light_at(COORD(0, 1)).set_color(RED)
+        other = lc.copy()
+        assert other.get_shown_bytes() == lc.get_shown_bytes()
+        other.get_light_at(COORD(0, 1)).turn_off()
+        assert lc.get_light_at(COORD(0, 1)).on
+
+    def test_diff_finds_changed_lights(self, collection_class: type[LightCollection]) -> None:
+        lc = collection_class(GRID(2, 3))
+        other = lc.copy()
+        assert lc.diff(other) == []
+        other.get_light_at(COORD(1, 0)).set_color(RED)
+        assert lc.diff(other) == [3]
+
+    def test_export_uses_the_order(self, collection_class: type[LightCollection]) -> None:
+        lc = collection_class(GRID(2, 3))
+        lc.get_light_at(COORD(0, 0)).set_color(RED)
+        lc.get_light_at(COORD(1, 2)).set_color(BLUE)
+        assert lc.export([5, 1, 0]) == bytes(BLUE) + bytes(BLACK) + bytes(RED)
+        assert lc.export([]) == b''
+
+    def test_colors_are_clamped_to_bytes(self, collection_class: type[LightCollection]) -> None:
+        lc = collection_class(GRID(1, 2))
+        lc.get_light_at(COORD(0, 0)).set_color(COLOR(127.6, -3, 300))
+        assert lc.get_shown_bytes()[:3] == bytes((127, 0, 255))
+
+
+class TestArrayLightCollection:
+
+    def test_lights_are_views_on_the_buffer(self) -> None:
+        lc = ArrayLightCollection(GRID(2, 3))
+        light = lc.get_light_at(COORD(1, 1))
+        assert isinstance(light, LightView)
+        assert light.color == WHITE
+        assert not light.on
+        light.set_color(RED)
+        assert lc.colors[12:15] == bytes(RED)
+        assert lc.on_mask[12:15] == b'\xff\xff\xff'
+        light.toggle()
+        assert lc.on_mask[12:15] == b'\x00\x00\x00'
+
+
+    def test_exporters_are_not_kept_forever(self) -> None:
+        lc = ArrayLightCollection(GRID(4, 4))
+        for start in range(16):
+            lc.export([(start + idx) % 16 for idx in range(16)])
+        assert get_exporter.cache_info().currsize <= 16
+
+
+class TestWiring:
+
+    @pytest.mark.parametrize('wiring, expected', [
+        (Wiring.COLUMN_SERPENTINE, (0, 3, 4, 1, 2, 5)),
+        (Wiring.ROW_MAJOR, (0, 1, 2, 3, 4, 5)),
+        (Wiring.ROW_SERPENTINE, (0, 1, 2, 5, 4, 3)),
+    ])
+    def test_led_order(self, wiring: Wiring, expected: tuple[int, ...]) -> None:
+        assert get_led_order(GRID(2, 3), wiring) == expected
+
+    def test_led_order_is_worked_out_once(self) -> None:
+        assert get_led_order(GRID(4, 4)) is get_led_order(GRID(4, 4))
+
+    def test_panels_are_chained(self) -> None:
+        panels = (
+            Panel(COORD(0, 2), GRID(2, 2), Wiring.ROW_MAJOR),
+            Panel(COORD(0, 0), GRID(2, 2), Wiring.COLUMN_SERPENTINE),
+        )
+        assert get_tiled_led_order(GRID(2, 4), panels) == (2, 3, 6, 7, 0, 4, 5, 1)
+
+    def test_panel_outside_canvas_fails(self) -> None:
+        with pytest.raises(OutOfGridRange):
+            get_tiled_led_order(GRID(2, 2), (Panel(COORD(1, 1), GRID(2, 2), Wiring.ROW_MAJOR),))
+
+    def test_panels_covering_canvas_pass(self) -> None:
+        check_panels(GRID(2, 4), (
+            Panel(COORD(0, 2), GRID(2, 2), Wiring.ROW_MAJOR),
+            Panel(COORD(0, 0), GRID(2, 2), Wiring.COLUMN_SERPENTINE),
+        ))
+
+    @pytest.mark.parametrize('panels', [
+        (Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR), Panel(COORD(0, 3), GRID(2, 2), Wiring.ROW_MAJOR)),
+        (Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR), Panel(COORD(0, 1), GRID(2, 2), Wiring.ROW_MAJOR)),
+        (Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR),),
+    ], ids=['outside', 'overlapping', 'gap'])
+    def test_bad_panels_fail(self, panels: tuple[Panel, ...]) -> None:
+        with pytest.raises(ValueError):
+            check_panels(GRID(2, 4), panels)
+
+    @pytest.mark.parametrize('rotation, expected', [
+        (0, [COORD(0, 0), COORD(0, 2), COORD(1, 0)]),
+        (90, [COORD(0, 1), COORD(2, 1), COORD(0, 0)]),
+        (180, [COORD(1, 2), COORD(1, 0), COORD(0, 2)]),
+        (270, [COORD(2, 0), COORD(0, 0), COORD(2, 1)]),
+    ])
+    def test_rotated_panel(self, rotation: int, expected: list[COORD]) -> None:
+        panel = Panel(COORD(0, 0), GRID(2, 3), Wiring.ROW_MAJOR, rotation)
+        assert [panel.get_canvas_coords(row, col) for row, col in [(0, 0), (0, 2), (1, 0)]] == expected
+        canvas = panel.get_canvas_size()
+        order = get_tiled_led_order(canvas, (panel,))
+        assert sorted(order) == list(range(6))
+
+    def test_bad_rotation_fails(self) -> None:
+        with pytest.raises(ValueError):
+            Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR, 45).get_canvas_coords(0, 0)
@@ -1,10 +1,20 @@
+import io
+import pathlib
+import sys
+import time
+import types
+
+import blessed
 import pytest
+from click.testing import CliRunner
 from unittest.mock import patch, Mock
 
 import matrix_display
 import matrix_modes
-from matrix_display import DisplayMatrix
-from matrix_common import GRID, COORD, WHITE, RED, BLUE
+import mocklights
+import terminal_renderer
+from matrix_display import DisplayMatrix, FrameOutput, FrameScheduler
+from matrix_common import GRID, COORD, WHITE, RED, BLUE, COLOR, Panel, Wiring
 from matrix_modes import CycleColors
 
 
@@ -61,10 +71,94 @@ class TestDisplayMatrix:
                     matrix_with_led.matrix_leds.set_led_color.assert_any_call(idx, *color)
                     idx += 1
 
+    @pytest.mark.parametrize('wiring', list(Wiring))
+    def test_display_leds_follows_the_wiring(self, wiring: Wiring) -> None:
+        matrix = DisplayMatrix(GRID(10, 12), [], wiring)
+        matrix.matrix_leds = mocklights.FastMockLights(None, 10 * 12)
+        for idx, light in enumerate(matrix.lights):
+            light.set_color(COLOR(idx, 0, 0))
+        matrix.display_leds()
+        sent = matrix.matrix_leds.snapshot()
+        assert [sent[idx * 3] for idx in range(10 * 12)] == list(matrix.led_order)
+        assert matrix.matrix_leds.get_led_color(1) == (12 if wiring == Wiring.COLUMN_SERPENTINE else 1, 0, 0)
+        assert matrix.matrix_leds.updates == 1
+
+    def test_panels_on_different_devices_get_their_own_strip(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(matrix_display, 'get_matrix_leds', lambda n, device: mocklights.FastMockLights(None, n))
+        matrix = DisplayMatrix(GRID(2, 4), [], panels=[
+            Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR),
+            Panel(COORD(0, 2), GRID(2, 2), Wiring.ROW_MAJOR, rotation=180, device='/dev/spidev1.0'),
+        ])
+        assert [strip.device for strip in matrix.strips] == ['/dev/spidev0.0', '/dev/spidev1.0']
+        for idx, light in enumerate(matrix.lights):
+            light.set_color(COLOR(idx, 0, 0))
+        matrix.display_leds()
+        first, second = (strip.leds.snapshot() for strip in matrix.strips)
+        assert list(first[::3]) == [0, 1, 4, 5]
+        assert list(second[::3]) == [7, 6, 3, 2]
+        matrix.clear_leds()
+        assert not any(strip.leds.snapshot().strip(b'\0') for strip in matrix.strips)
+
+    def test_panels_that_leave_a_gap_fail(self) -> None:
+        with pytest.raises(ValueError):
+            DisplayMatrix(GRID(2, 4), [], panels=[Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR)])
+
+    def test_matrix_leds_needs_a_single_strip(self) -> None:
+        matrix = DisplayMatrix(GRID(2, 4), [], panels=[
+            Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR),
+            Panel(COORD(0, 2), GRID(2, 2), Wiring.ROW_MAJOR, device='/dev/spidev1.0'),
+        ])
+        with pytest.raises(ValueError):
+            matrix.matrix_leds
+
+    def test_parallel_output_sends_each_strip(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(matrix_display, 'get_matrix_leds', lambda n, device: mocklights.FastMockLights(None, n))
+        matrix = DisplayMatrix(GRID(2, 4), [], panels=[
+            Panel(COORD(0, 0), GRID(2, 2), Wiring.ROW_MAJOR),
+            Panel(COORD(0, 2), GRID(2, 2), Wiring.ROW_MAJOR, device='/dev/spidev1.0'),
+        ], parallel_output=True)
+        assert matrix.output is not None
+        for idx, light in enumerate(matrix.lights):
+            light.set_color(COLOR(idx, 0, 0))
+        matrix.display_leds()
+        matrix.output.wait()
+        first, second = (strip.leds.snapshot() for strip in matrix.strips)
+        assert list(first[::3]) == [0, 1, 4, 5]
+        assert list(second[::3]) == [2, 3, 6, 7]
+        matrix.clear_leds()
+        assert not any(strip.leds.snapshot().strip(b'\0') for strip in matrix.strips)
+
     def test_display_leds_updates_the_strip(self, matrix_with_led: DisplayMatrix) -> None:
         matrix_with_led.display_leds()
         matrix_with_led.matrix_leds.update_strip.assert_called_once()
 
+    def test_logged_messages_are_drawn_under_the_status(self, matrix_no_led: DisplayMatrix) -> None:
+        out = io.StringIO()
+        matrix_no_led.renderer = terminal_renderer.TerminalRenderer(matrix_no_led.term, out)
+        matrix_no_led.renderer.log('slow_tick {}')
+        matrix_no_led.display_board(['Dropped frames: 0'])
+        assert out.getvalue().index('Dropped frames: 0') < out.getvalue().index('slow_tick {}')
+
+    def test_display_board_only_redraws_changed_lights(self, matrix_no_led: DisplayMatrix) -> None:
+        out = io.StringIO()
+        matrix_no_led.term = term = blessed.Terminal(kind='xterm-256color', force_styling=True)
+        matrix_no_led.renderer = terminal_renderer.TerminalRenderer(term, out)
+        matrix_no_led.lights.fill(RED)
+        matrix_no_led.display_board(['Dropped frames: 0'])
+        first = out.getvalue()
+        assert first.count('■') == 10 * 12
+        assert first.count(term.color_rgb(*RED)) == 1
+        assert 'Dropped frames: 0' in first
+        #
+        matrix_no_led.display_board(['Dropped frames: 0'])
+        assert out.getvalue() == first
+        #
+        matrix_no_led.lights.get_light_at(COORD(2, 3)).set_color(BLUE)
+        matrix_no_led.display_board(['Dropped frames: 0'])
+        update = out.getvalue()[len(first):]
+        assert update.count('■') == 1
+        assert term.move_xy(3, 2) + term.normal + term.color_rgb(*BLUE) + '■' in update
+
     def test_display_update_board_updates_all_modes(self, matrix_with_led: DisplayMatrix) -> None:
         matrix_with_led.modes = [
             m1 := Mock(),
@@ -74,3 +168,140 @@ class TestDisplayMatrix:
         m1.update.assert_called_once()
         m2.update.assert_called_once()
 
+
+
+class TestFrameScheduler:
+
+    def test_all_modes_are_due_at_the_start(self) -> None:
+        modes = [matrix_modes.Mode([]), matrix_modes.Mode([])]
+        scheduler = FrameScheduler(modes, 0.5)
+        assert scheduler.get_due_modes(10.0) == modes
+        assert scheduler.get_due_modes(10.2) == []
+        assert scheduler.get_next_due_time(10.2) == 10.5
+
+    def test_modes_run_at_their_own_rates(self) -> None:
+        fast = matrix_modes.Mode([])
+        fast.update_interval = 0.1
+        slow = matrix_modes.Mode([])
+        scheduler = FrameScheduler([fast, slow], 1.0)
+        counts = {fast: 0, slow: 0}
+        for tick in range(100):
+            for mode in scheduler.get_due_modes(tick / 100):
+                counts[mode] += 1
+        assert counts == {fast: 10, slow: 1}
+        assert scheduler.dropped_frames == 0
+
+    def test_modes_have_their_own_rates(self) -> None:
+        sand = matrix_modes.SandSim([], GRID(4, 4), {})
+        colors = matrix_modes.CycleColors([], [RED])
+        image = matrix_modes.ShowImage([], pathlib.Path('images', 'fire.gif'), GRID(4, 4))
+        idle = matrix_modes.Mode([])
+        scheduler = FrameScheduler([sand, colors, image, idle], 10.0)
+        counts = {sand: 0, colors: 0, image: 0, idle: 0}
+        for tick in range(2000):
+            for mode in scheduler.get_due_modes(tick / 1000):
+                counts[mode] += 1
+        assert counts == {sand: 40, colors: 2, image: 23, idle: 1}
+        assert scheduler.dropped_frames == 0
+
+    def test_schedule_does_not_drift(self) -> None:
+        mode = matrix_modes.Mode([])
+        scheduler = FrameScheduler([mode], 1.0)
+        scheduler.get_due_modes(0.0)
+        scheduler.get_due_modes(1.3)
+        assert scheduler.get_next_due_time(1.3) == 2.0
+
+    def test_late_updates_are_dropped_frames(self) -> None:
+        mode = matrix_modes.Mode([])
+        scheduler = FrameScheduler([mode], 1.0)
+        scheduler.get_due_modes(0.0)
+        assert scheduler.get_due_modes(3.5) == [mode]
+        assert scheduler.dropped_frames == 2
+        assert scheduler.get_next_due_time(3.5) == 4.0
+
+    def test_only_due_modes_are_updated(self, matrix_no_led: DisplayMatrix) -> None:
+        scheduler = FrameScheduler(matrix_no_led.modes, 1.0)
+        assert matrix_no_led.update_due_modes(scheduler, 0.0)
+        assert not matrix_no_led.update_due_modes(scheduler, 0.5)
+        assert matrix_no_led.update_due_modes(scheduler, 1.0)
+
+
+class TestFrameOutput:
+
+    def test_frames_are_sent_to_the_leds_and_screen(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(matrix_display, 'get_matrix_leds', lambda n, device: mocklights.FastMockLights(None, n))
+        matrix = DisplayMatrix(GRID(2, 2), [], Wiring.ROW_MAJOR)
+        drawn = []
+        monkeypatch.setattr(matrix, 'draw_board', lambda shown, status: drawn.append((shown, status)))
+        output = FrameOutput(matrix, True, True)
+        matrix.lights.get_light_at(COORD(0, 0)).set_color(RED)
+        output.show(['status'])
+        output.close()
+        assert matrix.matrix_leds.snapshot() == bytes(RED) + bytes(9)
+        assert drawn == [(bytes(RED) + bytes(9), ['status'])]
+
+    def test_next_frame_is_rendered_while_the_last_is_shown(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        matrix = DisplayMatrix(GRID(2, 2), [], Wiring.ROW_MAJOR)
+        drawn = []
+        def draw_board(shown: bytes, status: list[str]) -> None:
+            time.sleep(0.1)
+            drawn.append(shown)
+        monkeypatch.setattr(matrix, 'draw_board', draw_board)
+        output = FrameOutput(matrix, True, False)
+        start = time.perf_counter()
+        output.show()
+        # The copy of the frame is being shown so the lights can change
+        matrix.lights.get_light_at(COORD(0, 0)).set_color(RED)
+        assert time.perf_counter() - start < 0.1
+        output.show()
+        assert time.perf_counter() - start >= 0.1
+        output.close()
+        assert drawn == [bytes(12), bytes(RED) + bytes(9)]
+
+    def test_errors_showing_a_frame_are_raised(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        matrix = DisplayMatrix(GRID(2, 2), [], Wiring.ROW_MAJOR)
+        def draw_board(shown: bytes, status: list[str]) -> None:
+            raise OSError('No terminal')
+        monkeypatch.setattr(matrix, 'draw_board', draw_board)
+        output = FrameOutput(matrix, True, False)
+        output.show()
+        with pytest.raises(OSError):
+            output.show()
+        output.close()
+
+    def test_close_raises_an_error_showing_the_last_frame(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        matrix = DisplayMatrix(GRID(2, 2), [], Wiring.ROW_MAJOR)
+        def draw_board(shown: bytes, status: list[str]) -> None:
+            raise OSError('No terminal')
+        monkeypatch.setattr(matrix, 'draw_board', draw_board)
+        output = FrameOutput(matrix, True, False)
+        output.show()
+        with pytest.raises(OSError):
+            output.close()
+        assert not output.thread.is_alive()
+
+
+class TestMain:
+
+    def test_leds_are_cleared_when_showing_a_frame_fails(self, monkeypatch: pytest.MonkeyPatch,
+                                                         tmp_path: pathlib.Path) -> None:
+        strips: list[mocklights.FastMockLights] = []
+        def get_matrix_leds(n: int, device: str) -> mocklights.FastMockLights:
+            strips.append(mocklights.FastMockLights(None, n, keep_frames=True))
+            return strips[-1]
+        monkeypatch.setattr(matrix_display, 'get_matrix_leds', get_matrix_leds)
+        def draw_board(self: DisplayMatrix, shown: bytes, status: list[str]) -> None:
+            raise OSError('No terminal')
+        monkeypatch.setattr(DisplayMatrix, 'draw_board', draw_board)
+        config = types.ModuleType('failing_config')
+        config.get_layout = lambda: (GRID(2, 2), None)  # type: ignore[attr-defined]
+        config.get_modes = lambda matrix: [CycleColors([COORD(0, 0)], [RED], update_interval=0.01)]  # type: ignore[attr-defined]
+        monkeypatch.setitem(sys.modules, 'failing_config', config)
+        # Leave the test run's own SIGTERM handling alone
+        monkeypatch.setattr(matrix_display.signal, 'signal', Mock())
+        stats = tmp_path / 'stats.json'
+        result = CliRunner().invoke(matrix_display.main, [
+            '--screen', '--leds', '--config', 'failing_config', '--stats-file', str(stats)])
+        assert isinstance(result.exception, OSError)
+        assert stats.exists()
+        assert strips[0].frames[-1] == bytes(12)
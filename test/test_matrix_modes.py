@@ -1,7 +1,12 @@
+import pathlib
+
+import PIL.Image
 import pytest
 
-from matrix_common import LightCollection, GRID
-from matrix_modes import Mode, COORD, COLOR
+from matrix_common import LightCollection, ArrayLightCollection, GRID
+from matrix_modes import Mode, SandSim, ShowImage, VectorSandSimulation, COORD, COLOR, numpy
+
+needs_numpy = pytest.mark.skipif(numpy is None, reason='numpy is not installed')
 
 
 def test_mode_has_locations_that_are_coords() -> None:
@@ -15,3 +20,102 @@ def test_mode_can_be_updated() -> None:
     mode = Mode([])
     mode.update(LightCollection(GRID(10, 10)))
 
+
+
+@needs_numpy
+def test_vector_sand_falls_to_the_bottom() -> None:
+    sim = VectorSandSimulation(4, 5)
+    sim.probability_of_cascading = 0
+    sim.grid[0][1] = 2
+    sim.grid[1][1] = 1
+    sim.grid[2][3] = 3
+    sim._update_sand()
+    assert sim.grid[1][1] == 2 and sim.grid[2][1] == 1 and sim.grid[3][3] == 3
+    for _ in range(5):
+        sim._update_sand()
+    assert [row[1] for row in sim.grid] == [0, 0, 0, 2, 1]
+    assert sim.grid[4][3] == 3
+
+
+@needs_numpy
+def test_vector_sand_keeps_all_the_grains() -> None:
+    sim = VectorSandSimulation(8, 8)
+    sim.probability_of_cascading = 0.5
+    for col in range(8):
+        sim.grid[col % 3][col] = 1
+        sim.grid[3][col] = 2
+    for _ in range(20):
+        sim._update_sand()
+    assert (sim.grid != 0).sum() == 16
+
+
+@needs_numpy
+def test_sand_sim_can_use_vector_simulation() -> None:
+    mode = SandSim([COORD(0, 0)], GRID(4, 4), {0: COLOR(0, 0, 0), 1: COLOR(1, 1, 1)}, vectorized=True)
+    assert isinstance(mode.sim, VectorSandSimulation)
+    mode.update(LightCollection(GRID(4, 4)))
+
+
+@pytest.fixture
+def fire_locations() -> list[COORD]:
+    return LightCollection(GRID(16, 16)).get_box_coords(COORD(0, 0), GRID(16, 16))
+
+
+def test_show_image_decodes_every_frame(fire_locations: list[COORD]) -> None:
+    mode = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16))
+    assert len(mode.frames) == 16
+    assert mode.frame_durations == [90] * 16
+    assert all(len(frame) == 16 * 16 * 3 for frame in mode.frames)
+
+
+def test_show_image_frames_are_in_location_order(fire_locations: list[COORD]) -> None:
+    mode = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16))
+    with PIL.Image.open(pathlib.Path('images', 'fire.gif')) as image:
+        expected = mode.get_frame_from(image)
+    for idx, location in enumerate(fire_locations):
+        assert tuple(mode.frames[0][idx * 3:idx * 3 + 3]) == expected.getpixel((location.col, location.row))
+
+
+@pytest.mark.parametrize('collection_class', [LightCollection, ArrayLightCollection])
+def test_show_image_sets_the_lights(fire_locations: list[COORD], collection_class: type[LightCollection]) -> None:
+    mode = ShowImage(fire_locations[5:20], pathlib.Path('images', 'fire.gif'), GRID(16, 16))
+    lights = collection_class(GRID(16, 16))
+    mode.update(lights)
+    for idx, location in enumerate(fire_locations[5:20]):
+        light = lights.get_light_at(location)
+        assert light.on
+        assert light.color == tuple(mode.frames[0][idx * 3:idx * 3 + 3])
+    assert not lights.get_light_at(fire_locations[0]).on
+
+
+def test_show_image_plays_at_the_image_frame_rate(fire_locations: list[COORD]) -> None:
+    mode = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16))
+    assert mode.get_frame_index(100.0) == 0
+    assert mode.get_frame_index(100.089) == 0
+    assert mode.get_frame_index(100.091) == 1
+    assert mode.get_frame_index(100.0 + 0.09 * 17 + 0.001) == 1
+
+
+def test_show_image_can_cache_frames(fire_locations: list[COORD], tmp_path: pathlib.Path) -> None:
+    first = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16), cache_folder=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 1
+    second = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16), cache_folder=tmp_path)
+    assert second.frames == first.frames
+    assert second.frame_durations == first.frame_durations
+
+
+@pytest.mark.parametrize('contents', [b'', b'{"frame-size": 768}\n', b'[1, 2]\n', b'{"frame-size": 768, "durations": [90]}\n\0\0'])
+def test_show_image_replaces_a_bad_cache(fire_locations: list[COORD], tmp_path: pathlib.Path, contents: bytes) -> None:
+    expected = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16))
+    cache_file = expected.get_cache_file(pathlib.Path('images', 'fire.gif'), tmp_path)
+    cache_file.write_bytes(contents)
+    mode = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16), cache_folder=tmp_path)
+    assert mode.frames == expected.frames
+    assert mode.frame_durations == expected.frame_durations
+    assert mode.load_frames(cache_file)
+
+
+def test_show_image_is_next_due_when_the_frame_changes(fire_locations: list[COORD]) -> None:
+    mode = ShowImage(fire_locations, pathlib.Path('images', 'fire.gif'), GRID(16, 16))
+    assert mode.get_next_update_time(100.0, 1.0) == pytest.approx(100.09)
+    assert mode.get_next_update_time(100.1, 1.0) == pytest.approx(100.18)
@@ -0,0 +1,57 @@
+import blessed
+import pytest
+
+from mocklights import FastMockLights, MockLights
+
+
+@pytest.fixture
+def lights() -> FastMockLights:
+    return FastMockLights(None, 4, keep_frames=True)
+
+
+class TestFastMockLights:
+
+    def test_lights_only_show_after_update(self, lights: FastMockLights) -> None:
+        lights.set_led_color(2, 1, 2, 3)
+        assert lights.get_led_color(2) == (0, 0, 0)
+        lights.update_strip()
+        assert lights.get_led_color(2) == (1, 2, 3)
+        assert lights.snapshot() == bytes(6) + bytes((1, 2, 3)) + bytes(3)
+
+    def test_out_of_range_led_is_ignored(self, lights: FastMockLights) -> None:
+        assert not lights.set_led_color(4, 1, 2, 3)
+        assert not lights.set_led_color(-1, 1, 2, 3)
+
+    def test_fill_and_clear(self, lights: FastMockLights) -> None:
+        lights.fill_strip(5, 6, 7)
+        lights.update_strip()
+        assert lights.snapshot() == bytes((5, 6, 7)) * 4
+        lights.clear_strip()
+        lights.update_strip()
+        assert lights.snapshot() == bytes(12)
+
+    def test_updates_are_counted(self, lights: FastMockLights) -> None:
+        lights.update_strip()
+        lights.set_led_color(0, 9, 9, 9)
+        lights.update_strip()
+        assert lights.updates == 2
+        assert lights.bytes_sent == 24
+        assert lights.frames == [bytes(12), bytes((9, 9, 9)) + bytes(9)]
+
+    def test_whole_frame_can_be_set(self, lights: FastMockLights) -> None:
+        frame = bytes(range(lights.num_leds * 3))
+        lights.set_frame(frame)
+        lights.update_strip()
+        assert lights.snapshot() == frame
+        with pytest.raises(ValueError):
+            lights.set_frame(frame[:-3])
+
+
+def test_mock_lights_log_instead_of_printing(capsys: pytest.CaptureFixture[str]) -> None:
+    messages: list[str] = []
+    lights = MockLights(blessed.Terminal(), 4, log=messages.append)
+    lights.set_led_color(1, 1, 2, 3)
+    lights.set_led_color(3, 1, 2, 3)
+    lights.update_strip(0)
+    assert messages == ['Lights on: 1 3']
+    assert capsys.readouterr().out == ''
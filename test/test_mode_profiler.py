@@ -0,0 +1,69 @@
+import io
+import os
+import pathlib
+import pstats
+import signal
+
+import pytest
+
+from mode_profiler import BUCKETS, ModeProfiler, RollingHistogram
+
+
+class Fast:
+    def update(self, target: list[str]) -> list[str]:
+        target.append('fast')
+        return ['fast']
+
+
+class Slow(Fast):
+    def update(self, target: list[str]) -> list[str]:
+        sum(range(10000))
+        return super().update(target)
+
+
+def test_disabled_profiler_just_updates() -> None:
+    profiler = ModeProfiler()
+    target: list[str] = []
+    assert profiler.update_modes([Fast(), Slow()], target) == [['fast'], ['fast']]
+    assert target == ['fast', 'fast']
+    assert profiler.histograms == {}
+
+
+def test_updates_are_timed_per_mode() -> None:
+    profiler = ModeProfiler(enabled=True, sample_every=2)
+    for _ in range(10):
+        profiler.update_modes([Fast(), Slow()], [])
+    assert sorted(profiler.histograms) == ['Fast', 'Slow']
+    assert profiler.histograms['Slow'].count == 5
+    assert profiler.histograms['Slow'].get_summary()['p50'] > profiler.histograms['Fast'].get_summary()['p50']
+    assert profiler.get_report()[0].startswith('mode')
+
+
+def test_histogram_buckets() -> None:
+    histogram = RollingHistogram(size=3)
+    for seconds in [0.000001, 0.000020, 0.000020, 10.0]:
+        histogram.add(seconds)
+    buckets = histogram.get_buckets()
+    assert len(buckets) == len(BUCKETS) + 1
+    assert buckets[1] == 2
+    assert buckets[-1] == 1
+    assert histogram.count == 4
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='Needs SIGUSR1')
+def test_signal_saves_a_profile(tmp_path: pathlib.Path) -> None:
+    out = io.StringIO()
+    profiler = ModeProfiler(profile_ticks=3, profile_folder=tmp_path, out=out)
+    old_handler = signal.getsignal(signal.SIGUSR1)
+    try:
+        profiler.enable('test')
+        os.kill(os.getpid(), signal.SIGUSR1)
+        for _ in range(5):
+            profiler.update_modes([Slow()], [])
+    finally:
+        signal.signal(signal.SIGUSR1, old_handler)
+    profiles = list(tmp_path.glob('test-*.prof'))
+    assert len(profiles) == 1
+    stats = pstats.Stats(str(profiles[0]))
+    assert any(function[2] == 'update' for function in stats.stats)  # type: ignore[attr-defined]
+    assert 'Profiled 3 ticks' in out.getvalue()
@@ -0,0 +1,286 @@
+import copy
+import datetime
+import io
+import pathlib
+import time
+
+import blessed
+import pytest
+from unittest.mock import Mock
+
+import faces
+import frame_recording
+import led_strips
+import mocklights
+import modes
+import clock_updater
+from run_clock import Board, profile_imports, read_config_file, read_settings
+
+
+@pytest.fixture
+def board() -> Board:
+    b = Board(blessed.Terminal(), datetime.datetime(2024, 1, 1, 3, 0),
+              lights=lambda n: Mock(), light_color=(1, 2, 3), display=[modes.Normal(None)])
+    b.add_words(copy.deepcopy(faces.faces['16x16full']))
+    return b
+
+
+class TestLedMap:
+
+    def test_led_map_covers_every_light(self, board: Board) -> None:
+        assert len(board.led_index) == board.total_lights
+        assert sorted(board.led_index) == list(range(board.total_lights))
+
+    def test_led_map_zig_zags_down_the_columns(self, board: Board) -> None:
+        cols, rows = board.get_dimensions()
+        assert board.led_index[0] == 0
+        assert board.led_index[(rows - 1) * cols] == rows - 1
+        assert board.led_index[(rows - 1) * cols + 1] == rows
+        assert board.led_index[1] == 2 * rows - 1
+
+    def test_edge_map_only_has_edge_lights(self, board: Board) -> None:
+        cols, rows = board.get_dimensions()
+        assert len(board.edge_led_index) == 2 * cols + 2 * rows - 4
+        for row, col in board.edge_led_index:
+            assert row in (0, rows - 1) or col in (0, cols - 1)
+
+    def test_do_lights_sets_lit_letters_and_edges(self, board: Board) -> None:
+        board.update_board()
+        board.edge_lights[(0, 0)] = (9, 9, 9)
+        text = board.get_board_text(terminal_mode=False)
+        board.do_lights(text, board.lights)
+        lit = {call.args[0]: call.args[1:] for call in board.lights.set_led_color.call_args_list
+               if call.args[1:] != (0, 0, 0)}
+        assert lit[0] == (9, 9, 9)
+        assert len(lit) == 1 + sum(len(line.replace(' ', '')) for line in text)
+        board.lights.update_strip.assert_called_once()
+
+
+class TestDeltaLights:
+
+    def test_first_frame_sends_every_light(self, board: Board) -> None:
+        board.update_board()
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        assert board.lights.set_led_color.call_count == board.total_lights
+        board.lights.clear_strip.assert_not_called()
+
+    def test_unchanged_frame_is_not_sent(self, board: Board) -> None:
+        board.update_board()
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        board.lights.reset_mock()
+        board.update_board()
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        board.lights.set_led_color.assert_not_called()
+        board.lights.update_strip.assert_not_called()
+
+    def test_only_changed_lights_are_sent(self, board: Board) -> None:
+        board.update_board()
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        board.lights.reset_mock()
+        board.update_board()
+        board.edge_lights[(0, 0)] = (9, 9, 9)
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        board.lights.set_led_color.assert_called_once_with(0, 9, 9, 9)
+        board.lights.update_strip.assert_called_once()
+
+    def test_reset_lights_sends_every_light_again(self, board: Board) -> None:
+        board.update_board()
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        board.lights.reset_mock()
+        board.reset_lights()
+        board.do_lights(board.get_board_text(terminal_mode=False), board.lights)
+        assert board.lights.set_led_color.call_count == board.total_lights
+
+    def test_failed_send_to_a_group_shows_with_an_unchanged_frame(self) -> None:
+        failures = [1]
+
+        class FailingLights(mocklights.FastMockLights):
+            def update_strip(self, sleep_duration: float=0.1) -> None:
+                if failures[0]:
+                    failures[0] -= 1
+                    raise OSError('SPI send failed')
+                super().update_strip(sleep_duration)
+
+        strips: list[FailingLights] = []
+        def open_lights(n: int) -> led_strips.StripGroup:
+            strips.append(FailingLights(None, n))
+            return led_strips.StripGroup(strips, [n])
+        b = Board(blessed.Terminal(), datetime.datetime(2024, 1, 1, 3, 0), lights=open_lights,
+                  light_color=(1, 2, 3), display=[modes.Normal(None)])
+        b.add_words(copy.deepcopy(faces.faces['16x16full']))
+        b.update_board()
+        text = b.get_board_text(terminal_mode=False)
+        b.do_lights(text, b.lights)
+        assert isinstance(b.lights, led_strips.StripGroup)
+        while not all(pending.done() for pending in b.lights.pending if pending):
+            time.sleep(0.01)
+        with pytest.raises(Exception, match='SPI send failed'):
+            b.do_lights(text, b.lights)
+        b.do_lights(text, b.lights)
+        b.lights.wait()
+        assert strips[0].updates == 1
+        assert bytes((1, 2, 3)) in strips[0].snapshot()
+
+
+def test_simulated_lights_log_through_the_renderer(capsys: pytest.CaptureFixture[str]) -> None:
+    term = blessed.Terminal()
+    b = Board(term, datetime.datetime(2024, 1, 1, 3, 0), lights=lambda n: mocklights.MockLights(term, n),
+              light_color=(1, 2, 3), display=[modes.Normal(None)])
+    b.add_words(copy.deepcopy(faces.faces['16x16full']))
+    assert isinstance(b.lights, mocklights.MockLights)
+    b.lights.update_strip(0)
+    assert capsys.readouterr().out == ''
+    assert b.renderer.messages[-1].startswith('Lights on:')
+
+
+def test_frames_are_recorded_with_styling_on(tmp_path: pathlib.Path) -> None:
+    term = blessed.Terminal(kind='xterm-256color', force_styling=True)
+    b = Board(term, datetime.datetime(2024, 1, 1, 3, 0), light_color=(1, 2, 3), display=[modes.Normal(None)],
+              record_frames_to=tmp_path)
+    b.renderer.out = io.StringIO()
+    b.add_words(copy.deepcopy(faces.faces['16x16full']))
+    b.update_board()
+    b.show_board([])
+    b.stop_recording()
+    frames = list(frame_recording.FrameReader(tmp_path / 'frames.rec'))
+    cols, rows = b.get_dimensions()
+    assert len(frames) == 1
+    assert len(frames[0].colors) == rows * cols * 3
+    assert bytes((1, 2, 3)) in frames[0].colors
+
+
+class TestActivationPlans:
+
+    def test_plan_lights_the_words_in_order(self, board: Board) -> None:
+        plan = board.get_activation_plan('twenty five past three')
+        assert [board.all_words[idx].word.lower() for idx in plan] == ['twenty', 'five', 'past', 'three']
+        assert list(plan) == sorted(plan)
+
+    def test_plan_is_reused(self, board: Board) -> None:
+        plan = board.get_activation_plan('ten to four')
+        assert board.get_activation_plan('ten to four') is plan
+
+    def test_missing_word_raises_error(self, board: Board) -> None:
+        with pytest.raises(ValueError):
+            board.get_activation_plan('three banana')
+
+    def test_activate_text_turns_on_words(self, board: Board) -> None:
+        board.clear_board()
+        board.activate_text('half past two')
+        on_words = [word.word.lower() for word in board.all_words if word.on]
+        assert on_words == ['half', 'past', 'two']
+
+
+class TestLayout:
+
+    def test_dimensions_are_worked_out_once(self, board: Board) -> None:
+        assert board.dimensions == (16, 16)
+        board.rows = [[]]
+        assert board.get_dimensions() == (16, 16)
+
+    def test_board_text_only_shows_lit_words(self, board: Board) -> None:
+        board.clear_board()
+        assert board.get_board_text(terminal_mode=False) == [' ' * 16] * 16
+        board.activate_text('half past two')
+        text = board.get_board_text(terminal_mode=False)
+        assert [len(line) for line in text] == [16] * 16
+        assert ''.join(text).split() == ['HALF', 'PAST', 'TWO']
+
+    def test_word_spans_line_up_with_the_text(self, board: Board) -> None:
+        board.clear_board()
+        board.activate_text('ten to four')
+        text = board.get_board_text(terminal_mode=False)
+        for row, spans in enumerate(board.word_spans):
+            for word, start, end in spans:
+                if word.on:
+                    assert text[row][start:end] == word.word.upper()
+
+    def test_fill_characters_stay_the_same(self) -> None:
+        b = Board(blessed.Terminal(), datetime.datetime(2024, 1, 1, 3, 0), replace_blanks=True)
+        b.add_words(copy.deepcopy(faces.faces['16x16full']))
+        assert b.get_board_text(terminal_mode=False)[0] == b.get_board_text(terminal_mode=False)[0]
+        assert b.get_board_text(terminal_mode=False)[0].strip()
+
+
+class TestUpdateDelays:
+
+    def test_text_changes_at_next_phrase(self, board: Board) -> None:
+        board.time = datetime.datetime(2024, 1, 1, 3, 1, 30)
+        assert board.get_seconds_until_text_changes() == pytest.approx(1.5 * 60)
+
+    def test_date_changes_at_midnight(self, board: Board) -> None:
+        board.month_mode = True
+        board.time = datetime.datetime(2024, 1, 1, 23, 59, 30)
+        assert board.get_seconds_until_text_changes() == pytest.approx(30)
+        board.time = datetime.datetime(2024, 1, 1, 3, 0)
+        assert board.get_seconds_until_text_changes() == pytest.approx(21 * 60 * 60)
+
+    def test_normal_mode_waits_for_text_change(self, board: Board) -> None:
+        board.time = datetime.datetime(2024, 1, 1, 3, 2, 59)
+        assert modes.Normal(None).get_update_delay(board, 0.5) == pytest.approx(1)
+
+    def test_moving_edges_update_every_interval(self, board: Board) -> None:
+        assert modes.EdgeLightRWB(None).get_update_delay(board, 0.5) == 0.5
+        assert modes.EdgeLightBlank(None).get_update_delay(board, 0.5) is None
+
+
+class TestSettings:
+
+    def test_config_file_is_read(self, tmp_path: pathlib.Path) -> None:
+        config_file = tmp_path / 'config.sh'
+        config_file.write_text('# A comment\nexport CLOCK_MODE="EdgeLightCustom Normal"\nCLOCK_INTERVAL=0.5 # secs\n')
+        assert read_config_file(str(config_file)) == {'CLOCK_MODE': 'EdgeLightCustom Normal', 'CLOCK_INTERVAL': '0.5'}
+
+    def test_removed_config_variables_are_dropped(self, tmp_path: pathlib.Path,
+                                                   monkeypatch: pytest.MonkeyPatch) -> None:
+        config_file = tmp_path / 'config.sh'
+        monkeypatch.setattr(clock_updater, 'CONFIG_FILE', str(config_file))
+        monkeypatch.delenv('CLOCK_INTERVAL', raising=False)
+        config_names: set[str] = set()
+        config_file.write_text('CLOCK_INTERVAL=0.5\n')
+        assert read_settings(['--face-mode', '16x16full'], config_names)['interval'] == 0.5
+        config_file.write_text('# No interval\n')
+        assert read_settings(['--face-mode', '16x16full'], config_names)['interval'] == 10
+        assert config_names == set()
+
+    def test_old_lights_are_closed_when_replaced(self, board: Board) -> None:
+        lights = board.lights
+        assert isinstance(lights, Mock)
+        board.set_face('14x5')
+        lights.close.assert_called_once()
+
+    def test_face_can_be_changed(self, board: Board) -> None:
+        lights = board.lights
+        board.set_face('16x16full')
+        assert board.lights is lights
+        assert len(board.rows) == 16
+        board.set_face('14x5')
+        assert board.simple
+        assert board.get_dimensions() == (15, 6)
+        assert board.lights is not lights
+        assert board.sent_frame is None
+
+
+class TestStartup:
+
+    def test_ip_address_is_only_looked_up_when_shown(self, board: Board, monkeypatch: pytest.MonkeyPatch) -> None:
+        lookups = []
+
+        def get_ip_address() -> str:
+            lookups.append(1)
+            return '1.2'
+        monkeypatch.setattr(modes, 'get_ip_address', get_ip_address)
+        mode = modes.ShowIPAddress(None)
+        assert not lookups
+        mode.update(board)
+        assert mode.lookup is not None
+        mode.lookup.join()
+        mode.update(board)
+        mode.update(board)
+        assert mode.ip_address == '1.2'
+        assert len(lookups) == 1
+
+    def test_imports_are_profiled(self) -> None:
+        timings = profile_imports('faces')
+        assert 'faces' in [module.strip() for _, _, module in timings]
+        assert timings == sorted(timings, reverse=True)
@@ -0,0 +1,51 @@
+import io
+import json
+import pathlib
+import time
+
+from startup_timeline import Timeline, get_process_start
+
+
+def test_process_started_before_now() -> None:
+    start, _ = get_process_start()
+    assert start <= time.time()
+    timeline = Timeline('test')
+    timeline.mark('imports')
+    assert timeline.milestones['imports'] >= 0
+
+
+def test_first_tick_logs_and_saves_the_startup(tmp_path: pathlib.Path) -> None:
+    out = io.StringIO()
+    timeline = Timeline('test', tmp_path / 'stats' / 'test.json', out=out)
+    timeline.mark('imports')
+    timeline.mark('config')
+    timeline.mark('imports')
+    timeline.add_tick(0.002)
+    event, data = out.getvalue().split(' ', 1)
+    assert event == 'startup'
+    assert list(json.loads(data)['milestones']) == ['imports', 'config', 'first_frame']
+    saved = json.loads((tmp_path / 'stats' / 'test.json').read_text())
+    assert saved['milestones'] == json.loads(data)['milestones']
+
+
+def test_slow_ticks_are_logged() -> None:
+    out = io.StringIO()
+    timeline = Timeline('test', out=out, slow_tick=0.05)
+    for seconds in [0.001, 0.002, 0.2, 0.003]:
+        timeline.add_tick(seconds)
+    lines = out.getvalue().splitlines()
+    assert [line.split(' ', 1)[0] for line in lines] == ['startup', 'slow_tick']
+    stats = timeline.get_stats()
+    assert stats['ticks']['count'] == 4
+    assert stats['ticks']['max'] == 200.0
+    assert [tick['ms'] for tick in stats['slow_ticks']] == [200.0]
+
+
+def test_lines_can_go_to_a_log_instead_of_the_terminal() -> None:
+    out = io.StringIO()
+    logged: list[str] = []
+    timeline = Timeline('test', out=out, slow_tick=0.05, write_log=logged.append)
+    timeline.add_tick(0.001)
+    timeline.add_tick(0.2)
+    assert out.getvalue() == ''
+    assert [line.split(' ', 1)[0] for line in logged] == ['startup', 'slow_tick']
@@ -0,0 +1,68 @@
+import io
+
+import blessed
+import pytest
+
+from terminal_renderer import TerminalRenderer
+
+
+@pytest.fixture
+def term() -> blessed.Terminal:
+    return blessed.Terminal(kind='xterm-256color', force_styling=True)
+
+
+@pytest.fixture
+def renderer(term: blessed.Terminal) -> TerminalRenderer:
+    return TerminalRenderer(term, io.StringIO())
+
+
+class TestTerminalRenderer:
+
+    def test_first_draw_clears_the_screen(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        output = renderer.render([renderer.text_line('AB', term.red)])
+        assert output.startswith(term.home + term.clear)
+        assert 'AB' in output
+
+    def test_nothing_is_drawn_when_nothing_changed(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        lines = [renderer.text_line('ABC', term.red), renderer.text_line('DEF')]
+        renderer.render(lines)
+        assert renderer.render(lines) == ''
+
+    def test_only_changed_cells_are_drawn(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        renderer.render([renderer.text_line('ABCD', term.red), renderer.text_line('EFGH')])
+        output = renderer.render([renderer.text_line('ABXD', term.red), renderer.text_line('EFGH')])
+        assert output == term.move_xy(2, 0) + term.normal + term.red + 'X' + term.normal + term.move_xy(0, 2)
+
+    def test_runs_of_one_style_send_it_once(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        output = renderer.render([renderer.text_line('ABCD', term.green)])
+        assert output.count(term.green) == 1
+
+    def test_shorter_lines_are_cleared(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        renderer.render([renderer.text_line('ABCD'), renderer.text_line('EFGH')])
+        output = renderer.render([renderer.text_line('AB')])
+        assert term.move_xy(2, 0) + term.normal + term.clear_eol in output
+        assert term.move_xy(0, 1) + term.normal + term.clear_eol in output
+
+    def test_reset_draws_everything_again(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        lines = [renderer.text_line('ABC')]
+        renderer.render(lines)
+        renderer.reset()
+        assert renderer.render(lines).startswith(term.home + term.clear)
+
+    def test_draw_writes_once(self, term: blessed.Terminal, renderer: TerminalRenderer) -> None:
+        renderer.draw([renderer.text_line('ABC')])
+        assert 'ABC' in renderer.out.getvalue()  # type: ignore
+
+    def test_plain_output_without_styling(self) -> None:
+        renderer = TerminalRenderer(blessed.Terminal(force_styling=None), io.StringIO())
+        lines = [renderer.text_line('ABC'), renderer.text_line('DEF')]
+        assert renderer.render(lines) == 'ABC\nDEF\n'
+        assert renderer.render(lines) == ''
+
+    def test_messages_are_kept_to_draw(self, term: blessed.Terminal) -> None:
+        out = io.StringIO()
+        renderer = TerminalRenderer(term, out, max_messages=2)
+        for message in ['one', 'two', 'three']:
+            renderer.log(message)
+        assert list(renderer.messages) == ['two', 'three']
+        assert out.getvalue() == ''
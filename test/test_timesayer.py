@@ -199,6 +199,20 @@ class TestSayer(unittest.TestCase):
             twelve_mode=timesayer.TwelveMode.number,
         ))
 
+    def test_same_minute_gives_same_text(self):
+        first = timesayer.convert_to_text(datetime.datetime(2026, 1, 1, 5, 17, 3))
+        second = timesayer.convert_to_text(datetime.datetime(2026, 3, 2, 5, 17, 48))
+        self.assertEqual('quarter past five', first)
+        self.assertEqual(first, second)
+
+    def test_hour_minute_text_is_remembered(self):
+        timesayer.convert_hour_minute_to_text.cache_clear()
+        timesayer.convert_to_text(datetime.time(7, 41), show_a=True)
+        timesayer.convert_to_text(datetime.time(7, 41), show_a=True)
+        info = timesayer.convert_hour_minute_to_text.cache_info()
+        self.assertEqual(1, info.misses)
+        self.assertEqual(1, info.hits)
+
 class TestDateSayer(unittest.TestCase):
 
     def test_can_say_date(self):
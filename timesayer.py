@@ -1,5 +1,6 @@
 import datetime
 import enum
+import functools
 
 
 class Mode(enum.Enum):
@@ -54,6 +55,19 @@ complex_times = simple_times + [
 ]
 
 
+hour_words: dict[TwelveMode, list[str]] = {
+    twelve_mode: [
+        'midnight' if twelve_mode == TwelveMode.mode_name else 'twelve',
+        'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
+        'nine', 'ten', 'eleven',
+        'noon' if twelve_mode == TwelveMode.mode_name else 'twelve',
+        'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
+        'nine', 'ten', 'eleven'
+    ]
+    for twelve_mode in TwelveMode
+}
+
+
 def convert_to_text(t: datetime.datetime, simple: bool = False,
                     mode: Mode = Mode.am_pm, twelve_mode: TwelveMode = TwelveMode.mode_name,
                     show_a: bool=False) -> str:
@@ -64,28 +78,31 @@ def convert_to_text(t: datetime.datetime, simple: bool = False,
     if mode == Mode.short_date:
         return t.strftime('%a %-d %b')
 
-    hour_words = [
-        'midnight' if twelve_mode == TwelveMode.mode_name else 'twelve',
-        'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
-        'nine', 'ten', 'eleven',
-        'noon' if twelve_mode == TwelveMode.mode_name else 'twelve',
-        'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
-        'nine', 'ten', 'eleven'
-    ]
+    return convert_hour_minute_to_text(t.hour, t.minute, simple, mode, twelve_mode, show_a)
 
-    hour = hour_words[t.hour]
-    next_hour = hour_words[(t.hour + 1) % 24]
+
+@functools.lru_cache(maxsize=4096)
+def convert_hour_minute_to_text(hour_number: int, minute: int, simple: bool = False,
+                                mode: Mode = Mode.am_pm, twelve_mode: TwelveMode = TwelveMode.mode_name,
+                                show_a: bool=False) -> str:
+    """Return a text representation of the hour and minute
+
+    There are only a few thousand different answers so they are remembered
+    the first time they are worked out.
+    """
+    words = hour_words[twelve_mode]
+    hour = words[hour_number]
+    next_hour = words[(hour_number + 1) % 24]
 
     options = simple_times if simple else complex_times
-    options_scored = sorted(options, key=lambda o: abs(t.minute - o.mins))
-    best_option = options_scored[0]
+    best_option = min(options, key=lambda o: abs(minute - o.mins))
 
     if mode == Mode.simple:
         am_pm = ''
     elif mode == Mode.oclock:
         am_pm = ' oclock'
     else:
-        actual_reported_hour = t.hour + best_option.get_hour_offset()
+        actual_reported_hour = hour_number + best_option.get_hour_offset()
         match actual_reported_hour:
             case h if h < 12 or h > 23:
                 am_pm = ' AM'
@@ -93,6 +110,3 @@ def convert_to_text(t: datetime.datetime, simple: bool = False,
                 am_pm = ' PM'
 
     return best_option.get_text(hour, next_hour, am_pm, show_a)
-
-
-
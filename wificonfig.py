@@ -1,16 +1,10 @@
 """Responsible for configuring the WIFI by the clock reading a QR code"""
 
 from __future__ import annotations
+import asyncio
 import enum
-import subprocess
-import warnings
 from typing import TYPE_CHECKING
 
-try:
-    import qrcode
-except ImportError as e:
-    warnings.warn(f'Could not load qrcode module - is camera loaded?: {e}')
-
 if TYPE_CHECKING:
     from clock_updater import Updater
 
@@ -21,10 +15,17 @@ class WifiConfigStage(enum.Enum):
     NO_QR_READ = 'no QR could be read'
     NETWORK_NOT_JOINED = 'network could not be joined'
     NETWORK_JOINED = 'network joined'
+    FAILED = 'configuring the WIFI failed'
 
 
 class WifiConfigurator:
-    """The class responsible for moving through the config stages"""
+    """The class responsible for moving through the config stages
+
+    This runs as a task alongside the clock, so the slow parts (the camera,
+    reading the QR code and joining the network) are run in a thread or as
+    a subprocess. It doesn't change the board itself, instead it asks the
+    updater to change how the config mode looks when the stage changes.
+    """
 
     def __init__(self, updater: Updater, qrcode_file: str="") -> None:
         """Initialise the configurator"""
@@ -34,62 +35,48 @@ class WifiConfigurator:
         self.wifi_details: dict[str, str] = {}
         self.fixed_qrcode_filename = qrcode_file
 
-    def start_reading(self) -> WifiConfigStage:
+    async def start_reading(self) -> WifiConfigStage:
         """Start trying to read the QR code"""
         self.wifi_stage = WifiConfigStage.READING_QR_CODE
-        self.updater.config_mode.color = (100, 100, 255)
-        self.updater.config_mode.set_edges(True, False, False, False)
-        self.update_board()
+        self.updater.show_config((100, 100, 255), (True, False, False, False))
         #
         # Try to rad the QR code to get the network details
-        self.read_qr_code()
+        await self.read_qr_code()
         if self.wifi_stage == WifiConfigStage.WAITING_TO_JOIN_NETWORK:
-            self.updater.config_mode.set_edges(True, True, True, True)
-            self.update_board()
+            self.updater.show_config(edges=(True, True, True, True))
             #
             # Set these as the network settings and try to connect to that
             # network
-            self.wifi_stage = self.make_network_change()
+            self.wifi_stage = await self.make_network_change()
             #
             if self.wifi_stage == WifiConfigStage.NETWORK_JOINED:
                 # Connected!
-                self.updater.config_mode.color = (0, 255, 0)
+                color = (0, 255, 0)
             else:
                 # Not connected!
-                self.updater.config_mode.color = (255, 0, 0)
+                color = (255, 0, 0)
         else:
             #
             # Failed to get network details
-            self.updater.config_mode.color = (255, 0, 0)
-        #
-        self.updater.config_mode.top = True
-        self.updater.config_mode.right = True
-        self.updater.config_mode.left = True
-        self.updater.config_mode.bottom = True
+            color = (255, 0, 0)
         #
-        self.update_board()
+        self.updater.show_config(color, (True, True, True, True))
         return self.wifi_stage
 
-    def update_board(self) -> None:
-        """Update the display on the clock"""
-        logs = self.updater.update_board()
-        self.updater.board.show_board(logs)
-
     def go_idle(self) -> None:
         """Move back to idle"""
         self.wifi_stage = WifiConfigStage.IDLE
 
-    def read_qr_code(self) -> None:
+    async def read_qr_code(self) -> None:
         """Read the QR code"""
         for idx in range(self.max_retries):
-            print(f'Reading QR iteration {idx}')
+            self.updater.board.renderer.log(f'Reading QR iteration {idx}')
             #
             # Flash the top bar
-            self.updater.config_mode.cycle_edges()
-            self.update_board()
+            self.updater.show_config(cycle=True)
             #
             # Try to get a QR code
-            result = self.get_qr()
+            result = await asyncio.to_thread(self.get_qr)
             if result:
                 self.wifi_stage = WifiConfigStage.WAITING_TO_JOIN_NETWORK
                 return
@@ -98,6 +85,13 @@ class WifiConfigurator:
 
     def get_qr(self) -> bool:
         """Make one attempt to get the QR code and return the data or None if none found"""
+        #
+        # Only load the camera and image handling when the WIFI is being configured
+        try:
+            import qrcode
+        except ImportError as e:
+            self.updater.board.renderer.log(f'Could not load qrcode module - is camera loaded?: {e}')
+            return False
         result = qrcode.detect_mode(1, self.fixed_qrcode_filename)
         if not result:
             return False
@@ -109,25 +103,24 @@ class WifiConfigurator:
                 self.wifi_details = details
                 return True
 
-    def make_network_change(self) -> WifiConfigStage:
+    async def make_network_change(self) -> WifiConfigStage:
         """Set the network properties from the QR code"""
+        process = await asyncio.create_subprocess_exec(
+            'sudo',
+            './scripts/configure_network.sh',
+            '--ssid', self.wifi_details['SSID'],
+            '--password', self.wifi_details['PASSWORD'],
+            '--security', self.wifi_details['SECURITY'],
+            '--wait', '20',
+            '--ipfile',
+        )
         try:
-            result = subprocess.run(
-                [
-                    'sudo',
-                    './scripts/configure_network.sh',
-                    '--ssid', self.wifi_details['SSID'],
-                    '--password', self.wifi_details['PASSWORD'],
-                    '--security', self.wifi_details['SECURITY'],
-                    '--wait', '20',
-                    '--ipfile',
-                ],
-                capture_output=False, text=True, check=True
-            )
-        except subprocess.CalledProcessError as e:
-            print(f'Failed: {e}')
+            return_code = await process.wait()
+        except asyncio.CancelledError:
+            process.terminate()
+            raise
+        if return_code:
+            self.updater.board.renderer.log(f'Failed: configure_network.sh returned {return_code}')
             return WifiConfigStage.NETWORK_NOT_JOINED
         else:
             return WifiConfigStage.NETWORK_JOINED
-
-